@@ -0,0 +1,140 @@
+"""
+手牌分析后端选择
+导入时确定一次使用的实现：优先MahjongKit，不可用时退回纯Python实现
+"""
+import sys
+import logging
+from enum import Enum
+from pathlib import Path
+from typing import List
+
+logger = logging.getLogger(__name__)
+
+# MahjongKit位于项目根目录
+_mahjong_kit_path = Path(__file__).resolve().parents[3] / "MahjongKit"
+if str(_mahjong_kit_path) not in sys.path:
+    sys.path.insert(0, str(_mahjong_kit_path))
+
+try:
+    from core import Tile, SuitType
+    from fixed_validator import WinValidator, TingValidator
+
+    SHANTEN_BACKEND = "mahjongkit"
+
+    def is_winning_hand(tiles: List[Tile]) -> bool:
+        """检查是否胡牌"""
+        return WinValidator.is_winning_hand(tiles)
+
+    def calculate_shanten(tiles: List[Tile]) -> int:
+        """计算向听数"""
+        return TingValidator.calculate_shanten(tiles)
+
+except ImportError as e:
+    logger.warning("MahjongKit不可用，使用纯Python分析后端: %s", e)
+
+    SHANTEN_BACKEND = "pure_python"
+
+    class SuitType(Enum):
+        """花色类型（与MahjongKit保持一致）"""
+        WAN = 'm'
+        TIAO = 's'
+        TONG = 'p'
+
+    _SUIT_OFFSET = {SuitType.WAN: 0, SuitType.TIAO: 9, SuitType.TONG: 18}
+
+    class Tile:
+        """单张麻将牌"""
+        __slots__ = ("suit", "value")
+
+        def __init__(self, suit: SuitType, value: int):
+            if not isinstance(suit, SuitType):
+                raise ValueError(f"Invalid suit type: {suit}")
+            if not (1 <= value <= 9):
+                raise ValueError(f"Invalid tile value: {value}")
+            self.suit = suit
+            self.value = value
+
+    def _to_array(tiles: List[Tile]) -> List[int]:
+        counts = [0] * 27
+        for tile in tiles:
+            counts[_SUIT_OFFSET[tile.suit] + tile.value - 1] += 1
+        return counts
+
+    def _is_seven_pairs(counts: List[int]) -> bool:
+        return all(c in (0, 2) for c in counts) and counts.count(2) == 7
+
+    def _can_form_melds(counts: List[int], start: int) -> bool:
+        while start < 27 and counts[start] == 0:
+            start += 1
+        if start >= 27:
+            return True
+        if counts[start] >= 3:
+            counts[start] -= 3
+            ok = _can_form_melds(counts, start)
+            counts[start] += 3
+            if ok:
+                return True
+        if start % 9 <= 6 and counts[start + 1] and counts[start + 2]:
+            for i in range(3):
+                counts[start + i] -= 1
+            ok = _can_form_melds(counts, start)
+            for i in range(3):
+                counts[start + i] += 1
+            if ok:
+                return True
+        return False
+
+    def _is_standard_win(counts: List[int]) -> bool:
+        for i in range(27):
+            if counts[i] >= 2:
+                counts[i] -= 2
+                ok = _can_form_melds(counts, 0)
+                counts[i] += 2
+                if ok:
+                    return True
+        return False
+
+    def _max_melds(counts: List[int], start: int) -> int:
+        while start < 27 and counts[start] == 0:
+            start += 1
+        if start >= 27:
+            return 0
+        best = _max_melds(counts, start + 1)
+        if counts[start] >= 3:
+            counts[start] -= 3
+            best = max(best, 1 + _max_melds(counts, start))
+            counts[start] += 3
+        if start % 9 <= 6 and counts[start + 1] and counts[start + 2]:
+            for i in range(3):
+                counts[start + i] -= 1
+            best = max(best, 1 + _max_melds(counts, start))
+            for i in range(3):
+                counts[start + i] += 1
+        return best
+
+    def is_winning_hand(tiles: List[Tile]) -> bool:
+        """检查是否胡牌"""
+        if len({tile.suit for tile in tiles}) > 2:
+            return False
+        counts = _to_array(tiles)
+        return _is_seven_pairs(counts) or _is_standard_win(counts)
+
+    def calculate_shanten(tiles: List[Tile]) -> int:
+        """计算向听数"""
+        if len({tile.suit for tile in tiles}) > 2:
+            return 99
+        counts = _to_array(tiles)
+        if _is_seven_pairs(counts) or _is_standard_win(counts):
+            return 0
+
+        standard = 99
+        for i in range(27):
+            if counts[i] >= 2:
+                counts[i] -= 2
+                remaining = sum(counts)
+                if remaining % 3 == 0:
+                    standard = min(standard, remaining // 3 - _max_melds(counts, 0))
+                counts[i] += 2
+
+        pairs = max(0, 6 - sum(c // 2 for c in counts))
+        return min(standard, pairs)
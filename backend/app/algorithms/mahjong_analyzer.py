@@ -14,7 +14,7 @@ class MahjongAnalyzer:
     
     def analyze_game_state(self, game_state: GameState, player_id: int) -> AnalysisResult:
         """分析游戏状态并给出建议"""
-        if player_id not in game_state.player_hands:
+        if not 0 <= player_id < len(game_state.player_hands):
             return AnalysisResult(message="玩家不存在")
         
         hand = game_state.player_hands[player_id]
@@ -10,6 +10,9 @@ from typing import List, Dict, Any, Optional, Literal
 import sys
 from pathlib import Path
 import time
+import logging
+
+logger = logging.getLogger(__name__)
 
 # 添加backend目录到Python路径
 current_file = Path(__file__).resolve()
@@ -159,7 +162,7 @@ async def comprehensive_analyze(request: ComprehensiveAnalysisRequest):
         if analysis_type == "invalid":
             raise HTTPException(status_code=400, detail=f"无效的手牌数量: {tile_count}张")
         
-        print(f"🎯 分析类型: {analysis_type}, 手牌数量: {tile_count}张")
+        logger.debug("分析类型: %s, 手牌数量: %d张", analysis_type, tile_count)
         
         results = []
         final_analysis_type = analysis_type
@@ -173,7 +176,7 @@ async def comprehensive_analyze(request: ComprehensiveAnalysisRequest):
             start_time = time.time()
             timestamp = time.strftime('%H:%M:%S')
             
-            print(f"🔍 开始分析方法: {method_names[method]} ({method})")
+            logger.debug("开始分析方法: %s (%s)", method_names[method], method)
             
             try:
                 if method == "tenhou_website":
@@ -186,7 +189,7 @@ async def comprehensive_analyze(request: ComprehensiveAnalysisRequest):
                     raise ValueError(f"Unknown analysis method: {method}")
                 
                 analysis_time = time.time() - start_time
-                print(f"✅ {method_names[method]} 分析成功，耗时 {analysis_time:.3f}s，返回 {len(result)} 个选择")
+                logger.debug("%s 分析成功，耗时 %.3fs，返回 %d 个选择", method_names[method], analysis_time, len(result))
                 
                 results.append(SingleAnalysisResult(
                     method=method,
@@ -199,7 +202,7 @@ async def comprehensive_analyze(request: ComprehensiveAnalysisRequest):
                 
             except Exception as e:
                 analysis_time = time.time() - start_time
-                print(f"❌ {method_names[method]} 分析失败，耗时 {analysis_time:.3f}s，错误: {str(e)}")
+                logger.warning("%s 分析失败，耗时 %.3fs，错误: %s", method_names[method], analysis_time, e)
                 
                 results.append(SingleAnalysisResult(
                     method=method,
@@ -221,7 +224,7 @@ async def comprehensive_analyze(request: ComprehensiveAnalysisRequest):
         else:
             final_analysis_type = analysis_type
         
-        print(f"🎯 最终分析类型: {final_analysis_type}")
+        logger.debug("最终分析类型: %s", final_analysis_type)
         
         # 生成对比分析
         comparison = _generate_comparison(results) if len(results) > 1 else None
@@ -282,17 +285,17 @@ async def _analyze_with_tenhou_website(hand_mps: str) -> List[Dict[str, Any]]:
                 return processed_results[:6]
         else:
             # 天凤网站返回空结果时，尝试使用本地模拟作为降级方案
-            print("⚠️ 天凤网站返回空结果，尝试降级到本地模拟")
+            logger.warning("天凤网站返回空结果，尝试降级到本地模拟")
             try:
                 from mahjong_analyzer_final import simple_analyze
                 fallback_result = simple_analyze(hand_mps)
                 if isinstance(fallback_result, list) and len(fallback_result) > 0:
-                    print(f"✅ 降级成功，获得 {len(fallback_result)} 个选择")
+                    logger.debug("降级成功，获得 %d 个选择", len(fallback_result))
                     return fallback_result[:6]
                 else:
                     raise Exception("降级方案也失败")
             except Exception as fallback_e:
-                print(f"❌ 降级方案失败: {fallback_e}")
+                logger.warning("降级方案失败: %s", fallback_e)
                 raise Exception("天凤网站返回空结果且降级方案失败")
             
     except ImportError:
@@ -302,7 +305,7 @@ async def _analyze_with_tenhou_website(hand_mps: str) -> List[Dict[str, Any]]:
     except Exception as e:
         # 记录详细错误信息
         error_msg = f"天凤网站分析失败: {str(e)}"
-        print(f"天凤分析错误详情: {error_msg}")
+        logger.error("天凤分析错误详情: %s", error_msg)
         raise Exception(error_msg)
 
 async def _analyze_with_local_simulation(hand_mps: str) -> List[Dict[str, Any]]:
@@ -4,21 +4,8 @@
 from fastapi import APIRouter, HTTPException
 from pydantic import BaseModel
 from typing import List, Dict, Any, Optional
-import sys
-from pathlib import Path
 
-# 添加MahjongKit到Python路径
-import os
-current_file = Path(__file__).resolve()
-backend_dir = current_file.parent.parent.parent  # backend/
-project_root = backend_dir.parent  # mjlab/
-mahjong_kit_path = project_root / "MahjongKit"
-
-sys.path.insert(0, str(mahjong_kit_path))
-
-from core import Tile, TilesConverter, SuitType, PlayerState, Meld, MeldType
-from analyzer import HandAnalyzer as MahjongHandAnalyzer, AdvancedAIStrategy, AdvancedAIDecisionEngine
-from fixed_validator import WinValidator, TingValidator
+from ..algorithms.analyzer_backend import Tile, SuitType, calculate_shanten, is_winning_hand
 
 router = APIRouter()
 
@@ -93,11 +80,6 @@ async def analyze_hand(request: HandAnalysisRequest):
             if tile_counts[key] > 4:
                 raise HTTPException(status_code=400, detail=f"牌 {key} 超过4张")
         
-        # 创建玩家状态
-        player_state = PlayerState(0)
-        for tile in tiles:
-            player_state.add_tile(tile)
-        
         # 分析手牌
         analysis_result = {
             "is_winning": False,
@@ -109,7 +91,7 @@ async def analyze_hand(request: HandAnalysisRequest):
         
         # 检查是否胡牌
         if len(tiles) == 14:
-            is_winning = WinValidator.is_winning_hand(tiles)
+            is_winning = is_winning_hand(tiles)
             analysis_result["is_winning"] = is_winning
             
             if is_winning:
@@ -122,7 +104,7 @@ async def analyze_hand(request: HandAnalysisRequest):
                 }
             else:
                 # 计算向听数
-                shanten = TingValidator.calculate_shanten(tiles)
+                shanten = calculate_shanten(tiles)
                 analysis_result["shanten"] = shanten
                 
                 # 获取有效进张
@@ -143,7 +125,7 @@ async def analyze_hand(request: HandAnalysisRequest):
                                 break
                         
                         if valid_test:
-                            new_shanten = TingValidator.calculate_shanten(test_tiles)
+                            new_shanten = calculate_shanten(test_tiles)
                             if new_shanten < shanten:
                                 effective_draws.append(tile_to_dict(test_tile))
                 
@@ -159,7 +141,7 @@ async def analyze_hand(request: HandAnalysisRequest):
         
         elif len(tiles) == 13:
             # 13张牌，检查听牌
-            shanten = TingValidator.calculate_shanten(tiles)
+            shanten = calculate_shanten(tiles)
             analysis_result["shanten"] = shanten
             
             if shanten == 0:
@@ -180,7 +162,7 @@ async def analyze_hand(request: HandAnalysisRequest):
                                 valid_test = False
                                 break
                         
-                        if valid_test and WinValidator.is_winning_hand(test_tiles):
+                        if valid_test and is_winning_hand(test_tiles):
                             winning_tiles.append(tile_to_dict(test_tile))
                 
                 analysis_result["winning_tiles"] = winning_tiles
@@ -209,7 +191,7 @@ async def analyze_hand(request: HandAnalysisRequest):
                                 break
                         
                         if valid_test:
-                            new_shanten = TingValidator.calculate_shanten(test_tiles)
+                            new_shanten = calculate_shanten(test_tiles)
                             if new_shanten < shanten:
                                 effective_draws.append(tile_to_dict(test_tile))
                 
@@ -222,7 +204,7 @@ async def analyze_hand(request: HandAnalysisRequest):
                 }
         else:
             # 其他情况
-            shanten = TingValidator.calculate_shanten(tiles) if tiles else 8
+            shanten = calculate_shanten(tiles) if tiles else 8
             analysis_result["shanten"] = shanten
             analysis_result["detailed_analysis"] = {
                 "current_shanten": shanten,
@@ -322,7 +304,7 @@ async def get_effective_draws(request: HandAnalysisRequest):
         if not tiles:
             return {"effective_draws": []}
         
-        current_shanten = TingValidator.calculate_shanten(tiles)
+        current_shanten = calculate_shanten(tiles)
         effective_draws = []
         
         for suit in SuitType:
@@ -341,7 +323,7 @@ async def get_effective_draws(request: HandAnalysisRequest):
                         break
                 
                 if valid_test:
-                    new_shanten = TingValidator.calculate_shanten(test_tiles)
+                    new_shanten = calculate_shanten(test_tiles)
                     if new_shanten < current_shanten:
                         effective_draws.append({
                             "tile": tile_to_dict(test_tile),
@@ -370,7 +352,7 @@ async def check_winning(request: HandAnalysisRequest):
                 "reason": f"胡牌需要14张牌，当前{len(tiles)}张"
             }
         
-        is_winning = WinValidator.is_winning_hand(tiles)
+        is_winning = is_winning_hand(tiles)
         
         return {
             "is_winning": is_winning,
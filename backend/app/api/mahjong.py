@@ -705,37 +705,36 @@ async def import_game_record(request: dict):
                 "message": "请提供有效的牌谱数据"
             }
         
-        # 重置游戏状态
-        game_service.reset_game()
-        
-        # 导入定缺设置
-        missing_suits = game_record.get("missing_suits", {})
-        for player_id_str, missing_suit in missing_suits.items():
-            player_id = int(player_id_str)
-            game_service.set_player_missing_suit(player_id, missing_suit)
-        
-        # 导入最终状态
-        final_state = game_record.get("final_state", {})
-        if final_state:
-            # 设置玩家手牌
-            player_hands = final_state.get("player_hands", {})
-            for player_id_str, hand_data in player_hands.items():
-                game_service._game_state["player_hands"][player_id_str] = hand_data
+        # 重置、定缺和状态导入合并为一次保存
+        with game_service._batch_save():
+            # 重置游戏状态
+            game_service.reset_game()
+        
+            # 导入定缺设置
+            missing_suits = game_record.get("missing_suits", {})
+            for player_id_str, missing_suit in missing_suits.items():
+                player_id = int(player_id_str)
+                game_service.set_player_missing_suit(player_id, missing_suit)
+        
+            # 导入最终状态
+            final_state = game_record.get("final_state", {})
+            if final_state:
+                # 设置玩家手牌
+                player_hands = final_state.get("player_hands", {})
+                for player_id_str, hand_data in player_hands.items():
+                    game_service._game_state["player_hands"][player_id_str] = hand_data
             
-            # 设置弃牌记录
-            player_discarded = final_state.get("player_discarded_tiles", {})
-            game_service._game_state["player_discarded_tiles"] = player_discarded
+                # 设置弃牌记录
+                player_discarded = final_state.get("player_discarded_tiles", {})
+                game_service._game_state["player_discarded_tiles"] = player_discarded
             
-            # 设置公共弃牌
-            discarded_tiles = final_state.get("discarded_tiles", [])
-            game_service._game_state["discarded_tiles"] = discarded_tiles
+                # 设置公共弃牌
+                discarded_tiles = final_state.get("discarded_tiles", [])
+                game_service._game_state["discarded_tiles"] = discarded_tiles
         
-        # 导入操作历史
-        actions = game_record.get("actions", [])
-        game_service._game_state["actions_history"] = actions
-        
-        # 保存状态
-        game_service._save_state()
+            # 导入操作历史
+            actions = game_record.get("actions", [])
+            game_service._game_state["actions_history"] = actions
         
         return {
             "success": True,
@@ -1,37 +1,77 @@
-from fastapi import APIRouter, Depends, HTTPException, Response, Query
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response
 from fastapi.responses import StreamingResponse
-from typing import List, Optional
-import io
+from typing import List, Optional, Dict, Tuple
+from pathlib import Path
+import asyncio
 
 from app.models.game_record import GameRecord, GameReplay
 from app.models.response import ApiResponse
 from app.services.replay_service import ReplayService
-from app.services.redis_service import RedisService
-from app.services.standard_replay_service import StandardReplayService
+from app.services.redis_service import redis_service
+from app.services.standard_replay_service import StandardReplayService, load_standard_file_info
 
 router = APIRouter()
 
 async def get_replay_service():
-    """获取牌谱服务实例"""
-    redis_service = RedisService()
+    """获取牌谱服务实例（复用全局Redis连接池）"""
     return ReplayService(redis_service)
 
 async def get_standard_replay_service():
-    """获取标准格式牌谱服务实例"""
-    redis_service = RedisService()
+    """获取标准格式牌谱服务实例（复用全局Redis连接池）"""
     return StandardReplayService(redis_service)
 
+def _cache_headers(etag: Optional[str]) -> Dict[str, str]:
+    """牌谱可能被删除或重新导入，缓存每次都需重新验证；内容未变时由ETag返回304"""
+    if not etag:
+        return {"Cache-Control": "no-cache"}
+    return {"Cache-Control": "no-cache", "ETag": etag}
+
+def _etag_matches(request: Request, etag: Optional[str]) -> bool:
+    """检查If-None-Match是否命中当前ETag"""
+    if_none_match = request.headers.get("if-none-match")
+    if not etag or not if_none_match:
+        return False
+    candidates = {tag.strip().removeprefix("W/") for tag in if_none_match.split(",")}
+    return etag in candidates or "*" in candidates
+
+# 需注册在 /{game_id} 之前，否则 "list" 会被当作 game_id 匹配
+@router.get("/list")
+async def list_recent_games(
+    limit: int = Query(20, ge=1, le=100, description="返回记录数量"),
+    replay_service: ReplayService = Depends(get_replay_service)
+):
+    """获取最近的游戏记录列表"""
+    try:
+        recent_games = await replay_service.list_recent_games(limit)
+        
+        return ApiResponse(
+            success=True,
+            data=recent_games,
+            message=f"获取到 {len(recent_games)} 条游戏记录"
+        )
+    
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"获取游戏列表失败: {str(e)}")
+
 @router.get("/{game_id}", response_model=ApiResponse[GameReplay])
 async def get_game_replay(
     game_id: str,
+    request: Request,
+    response: Response,
     replay_service: ReplayService = Depends(get_replay_service)
 ):
     """获取游戏牌谱"""
     try:
+        etag = await replay_service.get_replay_etag(game_id)
+        headers = _cache_headers(etag)
+        if _etag_matches(request, etag):
+            return Response(status_code=304, headers=headers)
+        
         replay = await replay_service.get_game_replay(game_id)
         if not replay:
             raise HTTPException(status_code=404, detail="牌谱不存在")
         
+        response.headers.update(headers)
         return ApiResponse(
             success=True,
             data=replay,
@@ -44,17 +84,24 @@ async def get_game_replay(
 @router.get("/{game_id}/export/json")
 async def export_replay_json(
     game_id: str,
+    request: Request,
     replay_service: ReplayService = Depends(get_replay_service)
 ):
     """导出JSON格式牌谱"""
     try:
-        json_data = await replay_service.export_replay_json(game_id)
+        etag = await replay_service.get_replay_etag(game_id)
+        headers = _cache_headers(etag)
+        if _etag_matches(request, etag):
+            return Response(status_code=304, headers=headers)
+        
+        json_stream = await replay_service.stream_replay_json(game_id)
         
-        return Response(
-            content=json_data,
+        return StreamingResponse(
+            json_stream,
             media_type="application/json",
             headers={
-                "Content-Disposition": f"attachment; filename=replay_{game_id}.json"
+                "Content-Disposition": f"attachment; filename=replay_{game_id}.json",
+                **headers
             }
         )
     
@@ -66,17 +113,24 @@ async def export_replay_json(
 @router.get("/{game_id}/export/zip")
 async def export_replay_zip(
     game_id: str,
+    request: Request,
     replay_service: ReplayService = Depends(get_replay_service)
 ):
     """导出ZIP格式牌谱"""
     try:
-        zip_data = await replay_service.export_replay_file(game_id, format="zip")
+        etag = await replay_service.get_replay_etag(game_id)
+        headers = _cache_headers(etag)
+        if _etag_matches(request, etag):
+            return Response(status_code=304, headers=headers)
+        
+        zip_stream = await replay_service.stream_replay_zip(game_id)
         
         return StreamingResponse(
-            io.BytesIO(zip_data),
+            zip_stream,
             media_type="application/zip",
             headers={
-                "Content-Disposition": f"attachment; filename=replay_{game_id}.zip"
+                "Content-Disposition": f"attachment; filename=replay_{game_id}.zip",
+                **headers
             }
         )
     
@@ -104,48 +158,6 @@ async def get_player_history(
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"获取历史记录失败: {str(e)}")
 
-@router.get("/list")
-async def list_recent_games(
-    limit: int = Query(20, ge=1, le=100, description="返回记录数量"),
-    replay_service: ReplayService = Depends(get_replay_service)
-):
-    """获取最近的游戏记录列表"""
-    try:
-        # 从Redis获取所有游戏记录的键
-        game_keys = replay_service.redis.keys("game_record:*")
-        recent_games = []
-        
-        for key in game_keys[-limit:]:  # 获取最近的记录
-            try:
-                game_data = replay_service.redis.get(key)
-                if game_data:
-                    game_record = GameRecord.model_validate_json(game_data)
-                    # 只返回基本信息，不包含详细操作
-                    summary = {
-                        "game_id": game_record.game_id,
-                        "start_time": game_record.start_time,
-                        "end_time": game_record.end_time,
-                        "duration": game_record.duration,
-                        "players": [p.player_name for p in game_record.players],
-                        "winners": [p.player_name for p in game_record.players if p.is_winner],
-                        "total_actions": game_record.total_actions
-                    }
-                    recent_games.append(summary)
-            except:
-                continue
-        
-        # 按开始时间排序
-        recent_games.sort(key=lambda x: x["start_time"], reverse=True)
-        
-        return ApiResponse(
-            success=True,
-            data=recent_games,
-            message=f"获取到 {len(recent_games)} 条游戏记录"
-        )
-    
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=f"获取游戏列表失败: {str(e)}")
-
 @router.post("/{game_id}/share")
 async def create_share_link(
     game_id: str,
@@ -154,26 +166,14 @@ async def create_share_link(
     """创建牌谱分享链接"""
     try:
         # 验证牌谱是否存在
-        replay = await replay_service.get_game_replay(game_id)
-        if not replay:
+        if not await replay_service.exists(game_id):
             raise HTTPException(status_code=404, detail="牌谱不存在")
         
         # 创建分享链接 (这里可以实现短链接服务)
         share_link = f"/replay/{game_id}"
         
-        # 可以记录分享信息到Redis
-        share_key = f"share:{game_id}"
-        share_data = {
-            "game_id": game_id,
-            "created_at": replay.replay_metadata.get("generated_at"),
-            "share_count": 0
-        }
-        
-        replay_service.redis.set(
-            share_key,
-            share_data,
-            expire=30*24*3600  # 30天过期
-        )
+        # 记录分享信息到Redis
+        await replay_service.record_share(game_id)
         
         return ApiResponse(
             success=True,
@@ -196,17 +196,11 @@ async def delete_game_replay(
     """删除游戏牌谱"""
     try:
         # 检查牌谱是否存在
-        replay = await replay_service.get_game_replay(game_id)
-        if not replay:
+        if not await replay_service.exists(game_id):
             raise HTTPException(status_code=404, detail="牌谱不存在")
         
-        # 删除Redis中的记录
-        key = f"game_record:{game_id}"
-        replay_service.redis.delete(key)
-        
-        # 删除分享记录
-        share_key = f"share:{game_id}"
-        replay_service.redis.delete(share_key)
+        # 删除牌谱、分享记录和列表摘要索引
+        await replay_service.delete_game_record(game_id)
         
         return ApiResponse(
             success=True,
@@ -220,66 +214,22 @@ async def delete_game_replay(
 @router.get("/{game_id}/statistics")
 async def get_game_statistics(
     game_id: str,
+    request: Request,
+    response: Response,
     replay_service: ReplayService = Depends(get_replay_service)
 ):
     """获取游戏统计信息"""
     try:
-        replay = await replay_service.get_game_replay(game_id)
-        if not replay:
-            raise HTTPException(status_code=404, detail="牌谱不存在")
+        etag = await replay_service.get_replay_etag(game_id)
+        headers = _cache_headers(etag)
+        if _etag_matches(request, etag):
+            return Response(status_code=304, headers=headers)
         
-        game_record = replay.game_record
-        
-        # 计算统计信息
-        statistics = {
-            "basic_info": {
-                "game_id": game_record.game_id,
-                "duration": game_record.duration,
-                "total_actions": game_record.total_actions,
-                "winner_count": game_record.winner_count
-            },
-            "player_stats": [
-                {
-                    "player_name": p.player_name,
-                    "position": p.position,
-                    "final_score": p.final_score,
-                    "is_winner": p.is_winner,
-                    "actions": {
-                        "draw": p.draw_count,
-                        "discard": p.discard_count, 
-                        "peng": p.peng_count,
-                        "gang": p.gang_count
-                    }
-                }
-                for p in game_record.players
-            ],
-            "action_distribution": {},
-            "timeline": []
-        }
-        
-        # 统计操作分布
-        action_counts = {}
-        for action in game_record.actions:
-            action_type = action.action_type
-            action_counts[action_type] = action_counts.get(action_type, 0) + 1
-        
-        statistics["action_distribution"] = action_counts
-        
-        # 构建时间线 (关键操作)
-        key_actions = [action for action in game_record.actions 
-                      if action.action_type in ['peng', 'gang', 'hu', 'missing_suit']]
-        
-        statistics["timeline"] = [
-            {
-                "sequence": action.sequence,
-                "timestamp": action.timestamp.isoformat(),
-                "player_id": action.player_id,
-                "action_type": action.action_type,
-                "description": f"玩家{action.player_id+1} {action.action_type}"
-            }
-            for action in key_actions
-        ]
+        statistics = await replay_service.get_game_statistics(game_id)
+        if not statistics:
+            raise HTTPException(status_code=404, detail="牌谱不存在")
         
+        response.headers.update(headers)
         return ApiResponse(
             success=True,
             data=statistics,
@@ -370,33 +320,30 @@ async def import_default_standard_replay(
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"导入默认标准格式牌谱失败: {str(e)}")
 
+def _read_standard_file_status(standard_file: str) -> Tuple[bool, Dict]:
+    """检查标准格式文件并读取概要（阻塞文件I/O，需在线程中调用）"""
+    if not Path(standard_file).exists():
+        return False, {}
+    
+    try:
+        data = load_standard_file_info(standard_file)
+        return True, {
+            "game_id": data.game_info.get("game_id", "unknown"),
+            "mjtype": data.mjtype or "unknown",
+            "player_count": len(data.initial_hands),
+            "action_count": len(data.actions),
+            "description": data.game_info.get("description", "")
+        }
+    except:
+        return True, {"error": "文件格式错误"}
+
 @router.get("/standard/status")
 async def get_standard_format_support_status():
     """获取标准格式支持状态"""
     try:
-        from pathlib import Path
-        
-        # 检查标准格式文件是否存在
+        # 检查标准格式文件并获取文件信息，文件读取放到线程中避免阻塞事件循环
         standard_file = "/root/claude/hmjai/model/first_hand/sample_mahjong_game_final.json"
-        file_exists = Path(standard_file).exists()
-        
-        # 获取文件信息
-        file_info = {}
-        if file_exists:
-            import json
-            try:
-                with open(standard_file, 'r', encoding='utf-8') as f:
-                    data = json.load(f)
-                
-                file_info = {
-                    "game_id": data.get("game_info", {}).get("game_id", "unknown"),
-                    "mjtype": data.get("mjtype", "unknown"),
-                    "player_count": len(data.get("initial_hands", {})),
-                    "action_count": len(data.get("actions", [])),
-                    "description": data.get("game_info", {}).get("description", "")
-                }
-            except:
-                file_info = {"error": "文件格式错误"}
+        file_exists, file_info = await asyncio.to_thread(_read_standard_file_status, standard_file)
         
         return ApiResponse(
             success=True,
@@ -1,10 +1,21 @@
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse, ORJSONResponse
 from fastapi.staticfiles import StaticFiles
 import os
+import logging
+
+logger = logging.getLogger(__name__)
+
+# orjson为可选依赖，可用时所有JSON响应改用orjson序列化
+try:
+    import orjson  # noqa: F401
+    default_response_class = ORJSONResponse
+except ImportError:
+    default_response_class = JSONResponse
 
 # 创建FastAPI应用
-app = FastAPI()
+app = FastAPI(default_response_class=default_response_class)
 
 # 配置CORS
 app.add_middleware(
@@ -15,52 +26,36 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-# 导入基础模块
-from pydantic import BaseModel
-from typing import List, Dict, Any
-
 # 导入路由
-from .api import mahjong
+from .api import mahjong, hand_analyzer
 from .api.v1 import replay
 from .websocket import routes as websocket_routes
+from .services.redis_service import redis_service
+from .services.replay_service import flush_pending_saves_sync
 
 # 初始化变量
-hand_analyzer_available = False
 comprehensive_analyzer_available = False
 
-# 尝试导入手牌分析器
-try:
-    from .api import hand_analyzer
-    hand_analyzer_available = True
-    print("✅ 手牌分析器模块导入成功")
-except ImportError as e:
-    print(f"❌ 手牌分析器模块导入失败: {e}")
-    hand_analyzer_available = False
-
 # 尝试导入综合手牌分析器
 try:
     from .api import comprehensive_hand_analyzer
     comprehensive_analyzer_available = True
-    print("✅ 综合手牌分析器模块导入成功")
+    logger.debug("综合手牌分析器模块导入成功")
 except ImportError as e:
-    print(f"❌ 综合手牌分析器模块导入失败: {e}")
+    logger.warning("综合手牌分析器模块导入失败: %s", e)
     comprehensive_analyzer_available = False
 
 # 注册HTTP API路由
 app.include_router(mahjong.router, prefix="/api/mahjong", tags=["mahjong"])
 app.include_router(replay.router, prefix="/api/v1/replay", tags=["replay"])
-
-if hand_analyzer_available:
-    app.include_router(hand_analyzer.router, prefix="/api/mahjong", tags=["hand-analyzer"])
-    print("✅ 手牌分析器路由注册成功")
-else:
-    print("❌ 手牌分析器路由跳过注册")
+# 手牌分析后端在 algorithms.analyzer_backend 导入时选定，路由始终可用
+app.include_router(hand_analyzer.router, prefix="/api/mahjong", tags=["hand-analyzer"])
 
 if comprehensive_analyzer_available:
     app.include_router(comprehensive_hand_analyzer.router, prefix="/api/mahjong", tags=["comprehensive-analyzer"])
-    print("✅ 综合手牌分析器路由注册成功")
+    logger.debug("综合手牌分析器路由注册成功")
 else:
-    print("❌ 综合手牌分析器路由跳过注册")
+    logger.debug("综合手牌分析器路由跳过注册")
 
 # 注册WebSocket路由
 app.include_router(websocket_routes.router, prefix="/api", tags=["websocket"])
@@ -101,30 +96,6 @@ async def debug_routes():
             })
     return {"routes": routes}
 
-# 备用手牌分析端点（如果主要模块导入失败）
-if not hand_analyzer_available:
-    class FallbackHandAnalysisRequest(BaseModel):
-        tiles: List[str]
-        melds: List[Dict] = []
-    
-    @app.post("/api/mahjong/analyze-hand")
-    async def fallback_analyze_hand(request: FallbackHandAnalysisRequest):
-        """备用手牌分析端点"""
-        return {
-            "is_winning": False,
-            "shanten": 8,
-            "effective_draws": [],
-            "winning_tiles": [],
-            "detailed_analysis": {
-                "current_shanten": 8,
-                "patterns": ["MahjongKit导入失败"],
-                "suggestions": ["❌ 分析功能暂时不可用，请检查后端配置"]
-            }
-        }
-    
-    print("✅ 备用手牌分析端点已注册")
-
-
 @app.on_event("startup")
 async def startup_event():
     """应用启动时的初始化"""
@@ -136,6 +107,8 @@ async def startup_event():
 @app.on_event("shutdown") 
 async def shutdown_event():
     """应用关闭时的清理"""
+    # 写入尚在延迟窗口内的牌谱
+    flush_pending_saves_sync(redis_service)
     print("🀄 欢乐麻将辅助工具 API 已关闭")
 
 
@@ -1,5 +1,6 @@
 from pydantic import BaseModel, Field, ConfigDict
-from typing import List, Optional, Dict, Union
+from typing import List, Optional, Dict, Union, Literal
+from typing_extensions import TypedDict
 from datetime import datetime
 from enum import Enum
 
@@ -19,8 +20,15 @@ class GangType(str, Enum):
     AN_GANG = "an_gang"         # 暗杠
     JIA_GANG = "jia_gang"       # 加杠
 
+# 模型字段使用Literal，由pydantic-core直接校验，不再逐个创建枚举实例；
+# ActionType/GangType仍保留给调用方使用，其取值与下列字面量一致
+ActionTypeLiteral = Literal["draw", "discard", "peng", "gang", "hu", "pass", "missing_suit"]
+GangTypeLiteral = Literal["ming_gang", "an_gang", "jia_gang"]
+
 class MahjongCard(BaseModel):
     """麻将牌"""
+    model_config = ConfigDict(frozen=True)
+    
     id: int = Field(..., description="牌的ID")
     suit: str = Field(..., description="花色: wan/tiao/tong")
     value: int = Field(..., ge=1, le=9, description="牌面值1-9")
@@ -34,12 +42,12 @@ class GameAction(BaseModel):
     sequence: int = Field(..., description="操作序号")
     timestamp: datetime = Field(default_factory=datetime.now, description="操作时间")
     player_id: int = Field(..., description="操作玩家ID (0-3)")
-    action_type: ActionType = Field(..., description="操作类型")
+    action_type: ActionTypeLiteral = Field(..., description="操作类型")
     
     # 操作相关数据
     card: Optional[MahjongCard] = Field(None, description="相关的牌")
     target_player: Optional[int] = Field(None, description="目标玩家(碰杠时)")
-    gang_type: Optional[GangType] = Field(None, description="杠牌类型")
+    gang_type: Optional[GangTypeLiteral] = Field(None, description="杠牌类型")
     missing_suit: Optional[str] = Field(None, description="定缺花色")
     
     # 操作结果
@@ -47,6 +55,8 @@ class GameAction(BaseModel):
     score_change: int = Field(0, description="分数变化")
     
     model_config = ConfigDict(
+        frozen=True,
+        extra="forbid",
         json_schema_extra = {
             "example": {
                 "sequence": 1,
@@ -119,6 +129,34 @@ class GameRecord(BaseModel):
         }
     )
 
+    def to_summary(self) -> Dict:
+        """生成列表展示用的摘要信息"""
+        return {
+            "game_id": self.game_id,
+            "start_time": self.start_time.isoformat(),
+            "end_time": self.end_time.isoformat() if self.end_time else None,
+            "duration": self.duration,
+            "players": [p.player_name for p in self.players],
+            "winners": [p.player_name for p in self.players if p.is_winner],
+            "total_actions": self.total_actions
+        }
+
+class GameActionRow(TypedDict):
+    """只读的操作行，统计等只读路径使用，解析时不创建模型实例，时间戳保留ISO字符串"""
+    sequence: int
+    timestamp: str
+    player_id: int
+    action_type: ActionTypeLiteral
+
+class GameRecordStatsDoc(TypedDict):
+    """统计接口所需的游戏记录字段"""
+    game_id: str
+    duration: Optional[int]
+    total_actions: int
+    winner_count: int
+    players: List[PlayerGameRecord]
+    actions: List[GameActionRow]
+
 class GameReplay(BaseModel):
     """牌谱回放数据"""
     game_record: GameRecord = Field(..., description="游戏记录")
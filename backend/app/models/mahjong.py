@@ -1,7 +1,9 @@
 from enum import Enum
-from typing import List, Optional, Dict, Set, Any
-from pydantic import BaseModel, Field
-from datetime import datetime
+from typing import List, Optional, Dict, Set, Any, Tuple
+from dataclasses import dataclass, field
+from pydantic import BaseModel, ConfigDict, Field, PrivateAttr, field_serializer, field_validator
+import time
+import numpy as np
 
 
 class TileType(str, Enum):
@@ -11,6 +13,17 @@ class TileType(str, Enum):
     TONG = "tong"  # 筒
 
 
+# 27种牌的下标偏移：万0-8、条9-17、筒18-26
+_SUIT_OFFSET = {TileType.WAN: 0, TileType.TIAO: 9, TileType.TONG: 18}
+# 与下标一一对应的剩余牌统计键，如 "wan-1"
+_TILE_KEYS = tuple(f"{tile_type.value}-{value}" for tile_type in TileType for value in range(1, 10))
+
+
+def _pack_tile_indices(tiles: List["Tile"]) -> bytes:
+    """把牌列表打包为0-26下标的字节串"""
+    return bytes(_SUIT_OFFSET[tile.type] + tile.value - 1 for tile in tiles)
+
+
 class MeldType(str, Enum):
     """面子类型"""
     PENG = "peng"  # 碰
@@ -25,12 +38,20 @@ class GangType(str, Enum):
     JIA_GANG = "jia_gang"    # 加杠
 
 
-class Tile(BaseModel):
-    """麻将牌"""
+@dataclass(frozen=True, slots=True)
+class Tile:
+    """麻将牌（不可变，实例可安全共享）"""
     type: TileType
-    value: int = Field(..., ge=1, le=9)  # 1-9
+    value: int  # 1-9
     id: Optional[str] = None  # 牌的唯一标识
     
+    # 嵌套在pydantic模型中校验时忽略未知字段
+    __pydantic_config__ = ConfigDict(extra="ignore")
+    
+    def __post_init__(self):
+        if not 1 <= self.value <= 9:
+            raise ValueError(f"Invalid tile value: {self.value}")
+    
     def __str__(self) -> str:
         """转换为字符串表示"""
         type_map = {
@@ -40,17 +61,17 @@ class Tile(BaseModel):
         }
         return f"{self.value}{type_map[self.type]}"
     
+    def dict(self) -> Dict[str, Any]:
+        """转换为字典（与原pydantic模型的dict()输出一致）"""
+        return {"type": self.type, "value": self.value, "id": self.id}
+    
     @classmethod
     def from_code(cls, code: int) -> "Tile":
-        """从数字编码创建麻将牌"""
-        if 1 <= code <= 9:
-            return cls(type=TileType.WAN, value=code)
-        elif 11 <= code <= 19:
-            return cls(type=TileType.TIAO, value=code - 10)
-        elif 21 <= code <= 29:
-            return cls(type=TileType.TONG, value=code - 20)
-        else:
+        """从数字编码创建麻将牌（返回共享的预建实例）"""
+        tile = _TILE_BY_CODE[code] if 0 <= code < 30 else None
+        if tile is None:
             raise ValueError(f"Invalid tile code: {code}")
+        return tile
     
     def to_code(self) -> int:
         """转换为数字编码"""
@@ -64,7 +85,15 @@ class Tile(BaseModel):
             raise ValueError(f"Invalid tile type: {self.type}")
 
 
-class Meld(BaseModel):
+# 数字编码 -> 牌的查找表：1-9万、11-19条、21-29筒，其余位置为None
+_TILE_BY_CODE = tuple(
+    Tile(type=(TileType.WAN, TileType.TIAO, TileType.TONG)[code // 10], value=code % 10) if code % 10 else None
+    for code in range(30)
+)
+
+
+@dataclass(frozen=True, slots=True, kw_only=True)
+class Meld:
     """面子"""
     id: Optional[str] = None  # 面子的唯一标识
     type: MeldType
@@ -73,14 +102,17 @@ class Meld(BaseModel):
     gang_type: Optional[GangType] = None  # 杠牌类型
     source_player: Optional[int] = None  # 来源玩家ID
     original_peng_id: Optional[str] = None  # 加杠时原碰牌ID
-    timestamp: Optional[float] = Field(default_factory=lambda: datetime.now().timestamp())
+    timestamp: Optional[float] = field(default_factory=time.time)
+    
+    __pydantic_config__ = ConfigDict(extra="ignore")
 
 
-class HandTiles(BaseModel):
+@dataclass(slots=True)
+class HandTiles:
     """玩家手牌"""
     tiles: Optional[List[Tile]] = None  # 允许为None（其他玩家的手牌）
     tile_count: Optional[int] = 0  # 手牌数量（用于其他玩家）
-    melds: List[Meld] = []
+    melds: List[Meld] = field(default_factory=list)
     # 胜利状态相关字段
     is_winner: Optional[bool] = None
     win_type: Optional[str] = None  # "zimo"自摸 或 "dianpao"点炮
@@ -88,49 +120,111 @@ class HandTiles(BaseModel):
     dianpao_player_id: Optional[int] = None  # 点炮玩家ID
     missing_suit: Optional[str] = None  # 定缺花色
     
-    class Config:
-        # 允许额外字段，保持向后兼容
-        extra = "allow"
+    __pydantic_config__ = ConfigDict(extra="ignore")
 
 
-class PlayerAction(BaseModel):
+@dataclass(slots=True)
+class PlayerAction:
     """玩家动作"""
     player_id: int
     action_type: Optional[str] = None  # 某些历史记录可能使用 'type' 字段
     type: Optional[str] = None  # 兼容旧格式
-    tiles: Optional[List[Tile]] = []  # 改为可选，某些动作可能没有
+    tiles: Optional[List[Tile]] = field(default_factory=list)  # 改为可选，某些动作可能没有
     tile: Optional[Tile] = None  # 单个牌的动作
     source_player: Optional[int] = None  # 来源玩家
     source_player_id: Optional[int] = None  # 兼容字段
-    timestamp: Optional[float] = Field(default_factory=lambda: datetime.now().timestamp())
+    missing_suit: Optional[str] = None  # 定缺动作的花色
+    timestamp: Optional[float] = field(default_factory=time.time)
     
-    class Config:
-        # 允许额外字段，保持向后兼容
-        extra = "allow"
+    __pydantic_config__ = ConfigDict(extra="ignore")
+
+
+PLAYER_COUNT = 4
+
+
+def _players_to_list(value: Any, empty: type) -> Any:
+    """把以玩家ID字符串为键的字典转换为长度为PLAYER_COUNT的列表，缺失的玩家补空值"""
+    if isinstance(value, dict):
+        players = [empty() for _ in range(PLAYER_COUNT)]
+        for player_id, item in value.items():
+            index = int(player_id)
+            if not 0 <= index < PLAYER_COUNT:
+                raise ValueError(f"Invalid player id: {player_id}")
+            players[index] = item
+        return players
+    return value
 
 
 class GameState(BaseModel):
     """游戏状态"""
     game_id: str
-    player_hands: Dict[str, HandTiles] = {}
+    # 按玩家ID（0-3）下标存放；对外仍以{"0": ..., "3": ...}的字典形式收发
+    player_hands: List[HandTiles] = Field(default_factory=lambda: [HandTiles() for _ in range(PLAYER_COUNT)])
     current_player: int = 0
     discarded_tiles: List[Tile] = []
-    player_discarded_tiles: Dict[str, List[Tile]] = {}
+    player_discarded_tiles: List[List[Tile]] = Field(default_factory=lambda: [[] for _ in range(PLAYER_COUNT)])
     actions_history: List[PlayerAction] = []
     game_started: bool = False
     last_action: Optional[Dict[str, Any]] = None
     show_all_hands: Optional[bool] = None  # 是否显示所有玩家手牌
+    game_ended: Optional[bool] = None  # 牌局是否结束
+    test_mode: Optional[bool] = None  # 测试模式
+    tile_pool: Optional[List[Dict[str, Any]]] = None  # 牌池（原样保存，不逐张校验）
+    players: Optional[Dict[str, Dict[str, Any]]] = None  # 玩家信息，如座位
+    
+    # 状态版本号：字段被重新赋值或调用touch()时递增，统计结果按版本缓存
+    _version: int = PrivateAttr(default=0)
+    _stats_cache: Dict[tuple, Any] = PrivateAttr(default_factory=dict)
     
     class Config:
-        # 允许额外字段，保持向后兼容
-        extra = "allow"
+        # 已知字段均已显式声明，未知字段直接忽略
+        extra = "ignore"
+    
+    @field_validator("player_hands", mode="before")
+    @classmethod
+    def _player_hands_from_dict(cls, value: Any) -> Any:
+        return _players_to_list(value, dict)
+    
+    @field_validator("player_discarded_tiles", mode="before")
+    @classmethod
+    def _player_discards_from_dict(cls, value: Any) -> Any:
+        return _players_to_list(value, list)
+    
+    @field_serializer("player_hands", "player_discarded_tiles")
+    def _players_to_dict(self, value: list) -> Dict[str, Any]:
+        return {str(player_id): item for player_id, item in enumerate(value)}
+    
+    def __setattr__(self, name: str, value: Any) -> None:
+        super().__setattr__(name, value)
+        if not name.startswith("_"):
+            self.touch()
+    
+    def touch(self) -> None:
+        """标记状态已修改（原地修改手牌、弃牌、碰杠列表后需调用）"""
+        private = self.__pydantic_private__
+        private["_version"] += 1
+        private["_stats_cache"].clear()
+    
+    def _cached(self, name: str, compute):
+        """按状态版本缓存统计结果"""
+        # 经pydantic的__getattr__读取私有属性每次需数微秒，这里直接读__pydantic_private__
+        private = self.__pydantic_private__
+        cache = private["_stats_cache"]
+        key = (name, private["_version"])
+        result = cache.get(key)
+        if result is None:
+            result = cache[key] = compute()
+        return result
     
     def get_visible_tiles(self) -> List[Tile]:
         """获取所有可见的牌"""
+        return list(self._cached("visible_tiles", self._collect_visible_tiles))
+    
+    def _collect_visible_tiles(self) -> List[Tile]:
         visible = []
         visible.extend(self.discarded_tiles)
         
-        for hand in self.player_hands.values():
+        for hand in self.player_hands:
             for meld in hand.melds:
                 if meld.exposed:
                     visible.extend(meld.tiles)
@@ -139,11 +233,14 @@ class GameState(BaseModel):
     
     def calculate_remaining_tiles(self) -> int:
         """计算剩余牌数（包括所有已使用的牌）"""
+        return self._cached("remaining", self._remaining_count)
+    
+    def _remaining_count(self) -> int:
         total_tiles = 108  # 标准麻将总牌数
         used_tiles = 0
         
         # 计算所有玩家手牌数量
-        for hand in self.player_hands.values():
+        for hand in self.player_hands:
             # 使用tile_count字段，如果不存在则使用tiles长度
             if hand.tile_count is not None:
                 used_tiles += hand.tile_count
@@ -161,70 +258,55 @@ class GameState(BaseModel):
 
     def calculate_visible_remaining_tiles(self) -> int:
         """计算基于可见牌的剩余牌数"""
-        total_tiles = 108
-        used_tiles = 0
+        return self._compute_visible_stats()[0]
+
+    def calculate_remaining_tiles_by_type(self) -> Dict[str, int]:
+        """计算每种牌的剩余数量（基于可见牌）"""
+        # 同一版本只构建一次字典，之后每次返回浅拷贝
+        return self._cached("remaining_by_type", self._remaining_by_type_dict).copy()
+    
+    def _remaining_by_type_dict(self) -> Dict[str, int]:
+        return dict(zip(_TILE_KEYS, self._compute_visible_stats()[1].tolist()))
+    
+    def _compute_visible_stats(self) -> Tuple[int, np.ndarray]:
+        """一次遍历同时得到可见剩余总数和每种牌的剩余数量"""
+        return self._cached("visible_stats", self._collect_visible_stats)
+    
+    def _collect_visible_stats(self) -> Tuple[int, np.ndarray]:
+        # 已使用可见牌的下标连续存放在字节缓冲区中，每张牌1字节；"我"的手牌单独存放
+        used_codes = bytearray()
+        hand_codes = b""
+        my_hand_count = 0
         
-        # 计算所有玩家手牌数量
-        for player_id, hand in self.player_hands.items():
-            # 只计算"我"（player_id=0）的手牌
-            if player_id == "0":
+        for player_id, hand in enumerate(self.player_hands):
+            # 只计算"我"（player_id=0）的手牌，数量优先使用tile_count
+            if player_id == 0:
+                if hand.tiles is not None:
+                    hand_codes = _pack_tile_indices(hand.tiles)
                 if hand.tile_count is not None:
-                    used_tiles += hand.tile_count
+                    my_hand_count = hand.tile_count
                 elif hand.tiles is not None:
-                    used_tiles += len(hand.tiles)
+                    my_hand_count = len(hand.tiles)
             
-            # 计算碰牌杠牌数量
+            # 计算碰牌杠牌
             for meld in hand.melds:
                 if meld.type == MeldType.GANG and meld.gang_type == GangType.AN_GANG:
                     # 暗杠：只计算"我"的暗杠
-                    if player_id == "0":
-                        used_tiles += len(meld.tiles)
+                    if player_id == 0:
+                        used_codes += _pack_tile_indices(meld.tiles)
                 else:
                     # 明牌（碰牌、明杠）：所有玩家的都要计算
-                    used_tiles += len(meld.tiles)
-        
-        # 计算弃牌数量 - 所有玩家的弃牌都是可见的
-        used_tiles += len(self.discarded_tiles)
-        
-        return max(0, total_tiles - used_tiles)
-
-    def calculate_remaining_tiles_by_type(self) -> Dict[str, int]:
-        """计算每种牌的剩余数量（基于可见牌）"""
-        # 初始化每种牌的数量为4张
-        remaining_counts = {}
-        
-        # 初始化万、条、筒 1-9 各4张
-        for tile_type in [TileType.WAN, TileType.TIAO, TileType.TONG]:
-            for value in range(1, 10):
-                remaining_counts[f"{tile_type}-{value}"] = 4
-        
-        # 收集所有已使用的可见牌
-        used_tiles = []
-        
-        # 收集玩家的手牌和碰杠牌
-        for player_id, hand in self.player_hands.items():
-            # 只收集"我"的手牌
-            if player_id == "0" and hand.tiles is not None:
-                used_tiles.extend(hand.tiles)
-            
-            # 收集所有玩家的碰杠牌（除了暗杠）
-            for meld in hand.melds:
-                if meld.type == MeldType.GANG and meld.gang_type == GangType.AN_GANG:
-                    if player_id == "0":  # 只收集"我"的暗杠
-                        used_tiles.extend(meld.tiles)
-                else:  # 收集所有明牌
-                    used_tiles.extend(meld.tiles)
+                    used_codes += _pack_tile_indices(meld.tiles)
         
-        # 收集弃牌
-        used_tiles.extend(self.discarded_tiles)
+        # 所有玩家的弃牌都是可见的
+        used_codes += _pack_tile_indices(self.discarded_tiles)
         
-        # 更新剩余数量
-        for tile in used_tiles:
-            key = f"{tile.type}-{tile.value}"
-            if key in remaining_counts:
-                remaining_counts[key] = max(0, remaining_counts[key] - 1)
+        used_tiles = my_hand_count + len(used_codes)
         
-        return remaining_counts
+        # 每种牌4张，减去已使用数量
+        used_codes += hand_codes
+        counts = np.bincount(np.frombuffer(used_codes, dtype=np.uint8), minlength=27)
+        return max(0, 108 - used_tiles), np.maximum(0, 4 - counts)
 
 
 class AnalysisResult(BaseModel):
@@ -7,6 +7,22 @@ from pydantic import BaseModel, Field
 from typing import List, Dict, Optional, Any, Union
 from datetime import datetime
 from enum import Enum
+from functools import cached_property
+import numpy as np
+
+# 中文牌名 -> 0-26下标（万0-8、条9-17、筒18-26），用于把手牌批量转为numpy数组
+_TILE_INDEX_MAP: Dict[str, int] = {
+    f"{value}{chinese_suit}": suit_index * 9 + value - 1
+    for suit_index, chinese_suit in enumerate(('万', '条', '筒'))
+    for value in range(1, 10)
+}
+
+def _tile_names_to_codes(tile_names: List[str]) -> np.ndarray:
+    """把中文牌名列表一次性转换为uint8下标数组"""
+    try:
+        return np.fromiter((_TILE_INDEX_MAP[name] for name in tile_names), dtype=np.uint8, count=len(tile_names))
+    except KeyError as e:
+        raise ValueError(f"无效的牌名: {e.args[0]}") from None
 
 class StandardActionType(str, Enum):
     """标准格式的动作类型"""
@@ -25,6 +41,11 @@ class InitialHandData(BaseModel):
     count: int = Field(..., description="牌的数量")
     source: str = Field(..., description="数据来源：known/deduced")
     note: str = Field(..., description="备注说明")
+    
+    @cached_property
+    def tile_codes(self) -> np.ndarray:
+        """手牌的0-26下标数组，首次访问时转换一次，可直接用于np.bincount"""
+        return _tile_names_to_codes(self.tiles)
 
 class StandardGameAction(BaseModel):
     """标准格式的游戏动作"""
@@ -44,6 +65,11 @@ class FinalHandData(BaseModel):
     """最终手牌数据"""
     hand: List[str] = Field(default_factory=list, description="最终手牌")
     melds: List[MeldData] = Field(default_factory=list, description="面子列表")
+    
+    @cached_property
+    def tile_codes(self) -> np.ndarray:
+        """最终手牌的0-26下标数组，首次访问时转换一次"""
+        return _tile_names_to_codes(self.hand)
 
 class GameInfo(BaseModel):
     """游戏基本信息"""
@@ -64,6 +90,21 @@ class StandardReplayData(BaseModel):
     actions: List[StandardGameAction] = Field(default_factory=list, description="游戏动作序列")
     final_hands: Dict[str, FinalHandData] = Field(default_factory=dict, description="最终手牌")
 
+class StandardFileInfo(BaseModel):
+    """标准格式文件概要，只解析列表和状态展示需要的字段"""
+    game_info: Dict[str, Any] = Field(default_factory=dict, description="游戏基本信息")
+    mjtype: Optional[str] = Field(None, description="麻将类型")
+    initial_hands: Dict[str, Any] = Field(default_factory=dict, description="初始手牌")
+    actions: List[Any] = Field(default_factory=list, description="游戏动作序列")
+
+# 中文牌名 -> (英文花色, 牌值, 默认牌ID)，覆盖全部27种合法牌名，解析时只需一次字典查找
+# 默认牌ID与数字编码一致：万1-9、条11-19、筒21-29
+_FULL_TILE_MAP: Dict[str, tuple] = {
+    f"{value}{chinese_suit}": (suit, value, suit_index * 10 + value)
+    for suit_index, (chinese_suit, suit) in enumerate((('万', 'wan'), ('条', 'tiao'), ('筒', 'tong')))
+    for value in range(1, 10)
+}
+
 class TileConverter:
     """牌面转换工具"""
     
@@ -73,27 +114,10 @@ class TileConverter:
         将中文牌名转换为英文格式
         例：'1万' -> ('wan', 1)
         """
-        if not chinese_tile or len(chinese_tile) < 2:
+        result = _FULL_TILE_MAP.get(chinese_tile)
+        if result is None:
             raise ValueError(f"无效的牌名: {chinese_tile}")
-        
-        # 解析数字和花色
-        try:
-            value = int(chinese_tile[0])
-        except ValueError:
-            raise ValueError(f"无效的牌值: {chinese_tile[0]}")
-        
-        suit_char = chinese_tile[1]
-        suit_mapping = {
-            '万': 'wan',
-            '条': 'tiao', 
-            '筒': 'tong'
-        }
-        
-        suit = suit_mapping.get(suit_char)
-        if not suit:
-            raise ValueError(f"无效的花色: {suit_char}")
-        
-        return suit, value
+        return result[0], result[1]
     
     @staticmethod
     def english_to_chinese_tile(suit: str, value: int) -> str:
@@ -115,11 +139,14 @@ class TileConverter:
         """
         将中文牌名转换为后台MahjongCard格式的字典
         """
-        suit, value = TileConverter.chinese_to_english_suit(chinese_tile)
+        result = _FULL_TILE_MAP.get(chinese_tile)
+        if result is None:
+            raise ValueError(f"无效的牌名: {chinese_tile}")
+        suit, value, default_id = result
         
         if card_id is None:
-            # 生成唯一ID
-            card_id = hash(f"{suit}_{value}_{chinese_tile}") % 100000
+            # 未指定ID时使用预先计算的牌ID
+            card_id = default_id
         
         return {
             "id": card_id,
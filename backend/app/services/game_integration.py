@@ -2,16 +2,20 @@
 游戏集成示例 - 展示如何在游戏过程中集成牌谱记录功能
 """
 
+import asyncio
+import logging
 from typing import List, Dict, Optional
 from app.models.game_record import MahjongCard, ActionType, GangType
 from app.services.replay_service import ReplayService
-from app.services.redis_service import RedisService
+from app.services.redis_service import redis_service
+
+logger = logging.getLogger(__name__)
 
 class GameIntegrationExample:
     """游戏集成示例类"""
     
     def __init__(self):
-        self.redis_service = RedisService()
+        self.redis_service = redis_service
         self.replay_service = ReplayService(self.redis_service)
     
     async def start_new_game(self, players: List[Dict]) -> str:
@@ -27,8 +31,8 @@ class GameIntegrationExample:
             game_mode="xuezhan"
         )
         
-        print(f"🎮 游戏开始: {game_id}")
-        print(f"👥 玩家: {[p['name'] for p in players]}")
+        logger.debug("🎮 游戏开始: %s", game_id)
+        logger.debug("👥 玩家: %s", [p["name"] for p in players])
         
         return game_id
     
@@ -40,7 +44,7 @@ class GameIntegrationExample:
     ):
         """记录玩家起手牌"""
         await self.replay_service.record_initial_hand(game_id, player_id, cards)
-        print(f"📝 玩家{player_id+1}起手牌已记录: {len(cards)}张")
+        logger.debug("📝 玩家%d起手牌已记录: %d张", player_id + 1, len(cards))
     
     async def record_player_missing_suit(
         self, 
@@ -50,7 +54,7 @@ class GameIntegrationExample:
     ):
         """记录玩家定缺"""
         await self.replay_service.record_missing_suit(game_id, player_id, missing_suit)
-        print(f"🎯 玩家{player_id+1}定缺: {missing_suit}")
+        logger.debug("🎯 玩家%d定缺: %s", player_id + 1, missing_suit)
     
     async def record_draw_card(
         self, 
@@ -67,7 +71,7 @@ class GameIntegrationExample:
             card=card,
             game_state_snapshot=game_state
         )
-        print(f"🎴 玩家{player_id+1}摸牌: {card}")
+        logger.debug("🎴 玩家%d摸牌: %s", player_id + 1, card)
         return action
     
     async def record_discard_card(
@@ -85,7 +89,7 @@ class GameIntegrationExample:
             card=card,
             game_state_snapshot=game_state
         )
-        print(f"🗑️ 玩家{player_id+1}弃牌: {card}")
+        logger.debug("🗑️ 玩家%d弃牌: %s", player_id + 1, card)
         return action
     
     async def record_peng(
@@ -105,7 +109,7 @@ class GameIntegrationExample:
             target_player=target_player,
             game_state_snapshot=game_state
         )
-        print(f"🤜 玩家{player_id+1}碰牌: {card} (来自玩家{target_player+1})")
+        logger.debug("🤜 玩家%d碰牌: %s (来自玩家%d)", player_id + 1, card, target_player + 1)
         return action
     
     async def record_gang(
@@ -136,7 +140,7 @@ class GameIntegrationExample:
             GangType.JIA_GANG: "加杠"
         }.get(gang_type, "杠")
         
-        print(f"🔥 玩家{player_id+1}{gang_desc}: {card} (+{score_change}分)")
+        logger.debug("🔥 玩家%d%s: %s (+%d分)", player_id + 1, gang_desc, card, score_change)
         return action
     
     async def record_hu(
@@ -156,7 +160,7 @@ class GameIntegrationExample:
             score_change=score_change,
             game_state_snapshot=game_state
         )
-        print(f"🎉 玩家{player_id+1}胡牌! (+{score_change}分)")
+        logger.debug("🎉 玩家%d胡牌! (+%d分)", player_id + 1, score_change)
         return action
     
     async def end_game(
@@ -174,16 +178,16 @@ class GameIntegrationExample:
             hu_types=hu_types
         )
         
-        print(f"🏁 游戏结束: {game_id}")
-        print(f"🏆 胜利者: {winners}")
-        print(f"📊 最终得分: {final_scores}")
+        logger.debug("🏁 游戏结束: %s", game_id)
+        logger.debug("🏆 胜利者: %s", winners)
+        logger.debug("📊 最终得分: %s", final_scores)
         
         # 获取并显示牌谱信息
         replay = await self.replay_service.get_game_replay(game_id)
         if replay:
-            print(f"📝 牌谱已生成，共{len(replay.game_record.actions)}个操作")
-            print(f"📁 导出JSON: /api/v1/replay/{game_id}/export/json")
-            print(f"📦 导出ZIP: /api/v1/replay/{game_id}/export/zip")
+            logger.debug("📝 牌谱已生成，共%d个操作", len(replay.game_record.actions))
+            logger.debug("📁 导出JSON: /api/v1/replay/%s/export/json", game_id)
+            logger.debug("📦 导出ZIP: /api/v1/replay/%s/export/zip", game_id)
     
     async def run_demo_game(self):
         """运行演示游戏"""
@@ -202,18 +206,24 @@ class GameIntegrationExample:
         
         # 模拟游戏过程
         try:
-            # 记录起手牌 (简化示例)
-            for i in range(4):
-                initial_cards = [
-                    MahjongCard(id=j+1, suit="wan", value=j+1) 
-                    for j in range(13)
-                ]
-                await self.record_player_initial_hand(game_id, i, initial_cards)
+            # 记录起手牌 (简化示例)，四位玩家互不依赖，并发记录
+            initial_cards = [
+                MahjongCard(id=j+1, suit="wan", value=j % 9 + 1) 
+                for j in range(13)
+            ]
+            await asyncio.gather(*(
+                self.record_player_initial_hand(game_id, i, initial_cards)
+                for i in range(4)
+            ))
             
-            # 记录定缺
+            # 记录定缺，四条定缺操作合并为一次写入
             missing_suits = ["wan", "tiao", "tong", "wan"]
+            await self.replay_service.record_actions_batch(game_id, [
+                {"player_id": i, "action_type": ActionType.MISSING_SUIT, "missing_suit": suit}
+                for i, suit in enumerate(missing_suits)
+            ])
             for i, suit in enumerate(missing_suits):
-                await self.record_player_missing_suit(game_id, i, suit)
+                logger.debug("🎯 玩家%d定缺: %s", i + 1, suit)
             
             # 演示一些游戏操作
             card_wan_1 = MahjongCard(id=1, suit="wan", value=1)
@@ -258,7 +268,7 @@ class GameIntegrationExample:
             print(f"   📦 导出ZIP: http://localhost:8000/api/v1/replay/{game_id}/export/zip")
             
         except Exception as e:
-            print(f"❌ 演示游戏出错: {e}")
+            logger.error("❌ 演示游戏出错: %s", e)
             return None
         
         return game_id
@@ -270,5 +280,6 @@ async def main():
     await integration.run_demo_game()
 
 if __name__ == "__main__":
-    import asyncio
+    # 单独运行演示时输出全部记录日志
+    logging.basicConfig(level=logging.DEBUG, format="%(message)s")
     asyncio.run(main()) 
\ No newline at end of file
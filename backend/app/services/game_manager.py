@@ -1,7 +1,26 @@
+import asyncio
+import logging
 from typing import Dict, Optional
 from fastapi import WebSocket
 import json
 
+try:
+    import orjson
+except ImportError:  # orjson为可选依赖，缺失时退回标准库json
+    orjson = None
+
+logger = logging.getLogger(__name__)
+
+# 每个客户端待发送消息的上限，超过说明客户端已无法跟上，直接断开
+_SEND_QUEUE_SIZE = 256
+
+
+def _dumps(message: dict) -> str:
+    """序列化WebSocket消息"""
+    if orjson is not None:
+        return orjson.dumps(message, option=orjson.OPT_NON_STR_KEYS).decode()
+    return json.dumps(message, ensure_ascii=False)
+
 
 class GameManager:
     """游戏管理器，处理WebSocket连接和游戏状态同步"""
@@ -9,47 +28,63 @@ class GameManager:
     def __init__(self):
         self.active_connections: Dict[str, WebSocket] = {}
         self.game_states: Dict[str, dict] = {}
+        # 每个连接一个发送队列和一个写协程，保证同一socket只有一个写者
+        self.queues: Dict[str, asyncio.Queue] = {}
+        self.writers: Dict[str, asyncio.Task] = {}
     
     async def add_client(self, client_id: str, websocket: WebSocket):
         """添加客户端连接"""
+        queue: asyncio.Queue = asyncio.Queue(maxsize=_SEND_QUEUE_SIZE)
         self.active_connections[client_id] = websocket
-        print(f"客户端 {client_id} 已连接")
+        self.queues[client_id] = queue
+        self.writers[client_id] = asyncio.create_task(self._writer(client_id, websocket, queue))
+        logger.debug("客户端 %s 已连接", client_id)
     
     def remove_client(self, client_id: str):
         """移除客户端连接"""
-        if client_id in self.active_connections:
-            del self.active_connections[client_id]
-        if client_id in self.game_states:
-            del self.game_states[client_id]
-        print(f"客户端 {client_id} 已断开连接")
+        self.active_connections.pop(client_id, None)
+        self.game_states.pop(client_id, None)
+        self.queues.pop(client_id, None)
+        writer = self.writers.pop(client_id, None)
+        if writer is not None and writer is not asyncio.current_task():
+            writer.cancel()
+        logger.debug("客户端 %s 已断开连接", client_id)
     
-    async def send_to_client(self, client_id: str, message: dict):
-        """发送消息给特定客户端"""
-        if client_id in self.active_connections:
-            websocket = self.active_connections[client_id]
+    async def _writer(self, client_id: str, websocket: WebSocket, queue: asyncio.Queue):
+        """按顺序发送队列中的消息，发送失败时移除客户端"""
+        while True:
+            payload = await queue.get()
             try:
-                await websocket.send_text(json.dumps(message, ensure_ascii=False))
+                await websocket.send_text(payload)
             except Exception as e:
-                print(f"发送消息给客户端 {client_id} 失败: {e}")
+                logger.warning("发送消息给客户端 %s 失败: %s", client_id, e)
                 self.remove_client(client_id)
+                return
+    
+    def _enqueue(self, client_id: str, queue: asyncio.Queue, payload: str):
+        """把消息放入客户端的发送队列"""
+        try:
+            queue.put_nowait(payload)
+        except asyncio.QueueFull:
+            logger.warning("客户端 %s 发送队列已满，断开连接", client_id)
+            self.remove_client(client_id)
+    
+    async def send_to_client(self, client_id: str, message: dict):
+        """发送消息给特定客户端"""
+        queue = self.queues.get(client_id)
+        if queue is None:
+            return
+        self._enqueue(client_id, queue, _dumps(message))
     
     async def broadcast(self, message: dict, exclude_client: Optional[str] = None):
         """广播消息给所有客户端"""
-        disconnected_clients = []
+        # 只序列化一次，所有客户端共用同一份文本；实际发送由各自的写协程并发完成
+        payload = _dumps(message)
         
-        for client_id, websocket in self.active_connections.items():
+        for client_id, queue in list(self.queues.items()):
             if exclude_client and client_id == exclude_client:
                 continue
-            
-            try:
-                await websocket.send_text(json.dumps(message, ensure_ascii=False))
-            except Exception as e:
-                print(f"广播消息给客户端 {client_id} 失败: {e}")
-                disconnected_clients.append(client_id)
-        
-        # 清理断开的连接
-        for client_id in disconnected_clients:
-            self.remove_client(client_id)
+            self._enqueue(client_id, queue, payload)
     
     def update_game_state(self, client_id: str, game_state: dict):
         """更新游戏状态"""
@@ -65,4 +100,4 @@ class GameManager:
     
     def get_client_count(self) -> int:
         """获取连接的客户端数量"""
-        return len(self.active_connections) 
\ No newline at end of file
+        return len(self.active_connections)
\ No newline at end of file
@@ -1,10 +1,19 @@
 import redis
 import json
-from typing import Dict, List, Optional, Tuple, Any
-from copy import deepcopy
+from typing import Dict, List, Optional, Set, Tuple, Any
 import asyncio
-from datetime import datetime
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from functools import lru_cache
+import threading
+import time
 import uuid  # 添加 uuid 导入
+import logging
+
+try:
+    import orjson
+except ImportError:  # orjson为可选依赖，缺失时退回标准库json
+    orjson = None
 
 from ..models.mahjong import (
     GameState, HandTiles, Tile, TileType, Meld, MeldType, GangType, 
@@ -13,6 +22,104 @@ from ..models.mahjong import (
 from ..algorithms.mahjong_analyzer import MahjongAnalyzer
 from ..core.config import settings
 
+logger = logging.getLogger(__name__)
+
+_PLAYER_IDS = ("0", "1", "2", "3")
+
+
+def _ensure_schema(state: Dict[str, Any]) -> Dict[str, Any]:
+    """补齐状态中缺失的玩家和列表结构
+
+    状态在加载或被整体替换时规范化一次，各处理函数因此不必每次检查结构是否存在
+    """
+    player_hands = state.setdefault("player_hands", {})
+    player_discarded_tiles = state.setdefault("player_discarded_tiles", {})
+    for player_id_str in _PLAYER_IDS:
+        if player_id_str not in player_hands:
+            player_hands[player_id_str] = {
+                "tiles": [] if player_id_str == "0" else None,  # 其他玩家不存储具体牌面
+                "tile_count": 0,
+                "melds": []
+            }
+        if player_id_str not in player_discarded_tiles:
+            player_discarded_tiles[player_id_str] = []
+    state.setdefault("discarded_tiles", [])
+    state.setdefault("actions_history", [])
+    return state
+
+
+# 可定缺的花色
+_VALID_SUITS = frozenset(("wan", "tiao", "tong"))
+
+# 27种牌各一个共享的牌字典；牌字典从不被原地修改，可在各局之间共享
+_TILE_KINDS = tuple(
+    {"type": tile_type, "value": value}
+    for tile_type in ("wan", "tiao", "tong")
+    for value in range(1, 10)
+)
+
+# 完整牌库模板（导入时构建一次），每种牌4张
+_TILE_POOL_TEMPLATE = tuple(tile for tile in _TILE_KINDS for _ in range(4))
+
+# 牌库持久化时每张牌编码为一个字母，108张牌只占108字节。
+# 按对象id查表，只有来自模板的共享牌字典才能编码，其他形式的牌库原样保存
+_POOL_CHAR_BY_ID = {id(tile): chr(ord("a") + i) for i, tile in enumerate(_TILE_KINDS)}
+_POOL_TILE_BY_CHAR = {chr(ord("a") + i): tile for i, tile in enumerate(_TILE_KINDS)}
+
+
+def _encode_tile_pool(pool: List[Dict]) -> Optional[str]:
+    """把牌库编码为字符串，含非模板牌时返回None"""
+    try:
+        return "".join([_POOL_CHAR_BY_ID[id(tile)] for tile in pool])
+    except KeyError:
+        return None
+
+
+def _decode_tile_pool(encoded: str) -> List[Dict]:
+    """把编码后的牌库还原为共享牌字典列表"""
+    return [_POOL_TILE_BY_CHAR[char] for char in encoded]
+
+# 状态写入Redis时使用紧凑格式：不加空白、不转义中文
+_STATE_JSON_SEPARATORS = (",", ":")
+
+
+def _dumps(value: Any):
+    """序列化写入Redis的值（orjson直接输出UTF-8字节）"""
+    if orjson is not None:
+        return orjson.dumps(value)
+    return json.dumps(value, ensure_ascii=False, separators=_STATE_JSON_SEPARATORS)
+
+
+def _loads(data):
+    """反序列化从Redis读出的值（str或bytes均可）"""
+    if orjson is not None:
+        return orjson.loads(data)
+    return json.loads(data)
+
+
+# 玩家信息固定不变，各局共享同一份
+_PLAYERS_TEMPLATE = {
+    "0": {"position": "我"},
+    "1": {"position": "下家"},
+    "2": {"position": "对家"},
+    "3": {"position": "上家"}
+}
+
+
+@lru_cache(maxsize=1)
+def _get_redis() -> redis.Redis:
+    """创建一次Redis客户端，之后复用"""
+    return redis.Redis(
+        host=settings.REDIS_HOST,
+        port=settings.REDIS_PORT,
+        db=settings.REDIS_DB,
+        password=settings.REDIS_PASSWORD
+    )
+
+
+# Redis写入在单个后台线程中按提交顺序执行，请求处理（事件循环）不再等待网络往返
+_STATE_WRITER = ThreadPoolExecutor(max_workers=1, thread_name_prefix="mahjong-state-writer")
+
 
 class MahjongGameService:
     """麻将游戏服务 - 真实辅助工具版本
@@ -24,15 +131,23 @@ class MahjongGameService:
     """
     
     def __init__(self):
-        # 初始化Redis连接
-        self.redis = redis.Redis(
-            host=settings.REDIS_HOST,
-            port=settings.REDIS_PORT,
-            db=settings.REDIS_DB,
-            password=settings.REDIS_PASSWORD,
-            decode_responses=True
-        )
+        # 所有服务实例共用同一个Redis客户端（及其连接池）
+        self.redis = _get_redis()
+        # 状态按顶层字段存成Redis哈希，每次只重写本次改动的字段
         self.game_state_key = "mahjong:game_state"
+        # 操作历史只会追加，单独存成Redis列表，每次保存只写入新增的部分
+        self.history_key = "mahjong:actions_history"
+        # 大于0时_save_state不落盘，由最外层的_batch_save统一保存一次
+        self._save_suspended = 0
+        # 暂停期间累计的改动字段；None表示需要整体重写
+        self._dirty_fields: Optional[Set[str]] = set()
+        # 从旧格式（整体JSON字符串）加载时，首次保存需要整体重写以迁移格式
+        self._needs_full_write = False
+        # 已写入Redis的历史列表及其长度；列表被整体替换或截断时需要重写
+        self._persisted_history: Optional[List[Dict]] = None
+        self._persisted_history_len = 0
+        # 后台写入失败时置位，下次保存在调用线程上读取并改为整体重写
+        self._write_failed = threading.Event()
         # 从Redis加载游戏状态，如果没有则创建新的
         self._game_state = self._load_or_create_state()
         self.analyzer = MahjongAnalyzer()
@@ -40,23 +155,125 @@ class MahjongGameService:
     def _load_or_create_state(self) -> Dict[str, Any]:
         """从Redis加载游戏状态，如果不存在则创建新的"""
         try:
+            # 先等待尚未落盘的写入完成，避免读到旧状态
+            _STATE_WRITER.submit(lambda: None).result()
+            
             # 尝试从Redis加载
-            state_json = self.redis.get(self.game_state_key)
-            if state_json:
-                return json.loads(state_json)
+            key_type = self.redis.type(self.game_state_key)
+            if key_type == b"hash":
+                state = {
+                    name.decode(): _loads(value)
+                    for name, value in self.redis.hgetall(self.game_state_key).items()
+                }
+            elif key_type == b"string":
+                state = _loads(self.redis.get(self.game_state_key))
+                self._needs_full_write = True
+            else:
+                state = None
+            
+            if state:
+                if isinstance(state.get("tile_pool"), str):
+                    state["tile_pool"] = _decode_tile_pool(state["tile_pool"])
+                # 旧格式的历史直接嵌在状态里，下次保存时会整体迁移到列表
+                if "actions_history" not in state:
+                    history = self.redis.lrange(self.history_key, 0, -1)
+                    state["actions_history"] = [_loads(item) for item in history]
+                    self._persisted_history = state["actions_history"]
+                    self._persisted_history_len = len(history)
+                return _ensure_schema(state)
         except Exception as e:
-            print(f"从Redis加载状态失败: {e}")
+            logger.error("从Redis加载状态失败: %s", e)
         
         # 如果加载失败或不存在，创建新的状态
         return self._create_initial_state()
     
-    def _save_state(self):
-        """保存游戏状态到Redis"""
+    @contextmanager
+    def _batch_save(self):
+        """合并块内的多次保存，退出时只写一次Redis"""
+        self._save_suspended += 1
+        try:
+            yield
+        finally:
+            self._save_suspended -= 1
+            if not self._save_suspended:
+                fields, self._dirty_fields = self._dirty_fields, set()
+                if fields is None or fields:
+                    self._write_state(fields)
+    
+    def _save_state(self, *fields: str):
+        """保存游戏状态到Redis
+
+        fields为本次改动的顶层字段，只重写这些字段；不传时整体重写
+        """
+        if self._save_suspended:
+            if not fields:
+                self._dirty_fields = None
+            elif self._dirty_fields is not None:
+                self._dirty_fields.update(fields)
+            return
+        self._write_state(set(fields) if fields else None)
+    
+    def _write_state(self, fields: Optional[Set[str]]):
+        """把指定字段（None为全部）和新增的操作历史写入Redis
+
+        序列化在调用线程完成（相当于对当前状态拍快照），实际写入交给后台线程
+        """
+        if self._write_failed.is_set():
+            # 之前有写入丢失，Redis中的哈希和列表已不完整
+            self._write_failed.clear()
+            self._needs_full_write = True
+            self._persisted_history = None
+        try:
+            state = self._game_state
+            pipe = self.redis.pipeline(transaction=False)
+            if fields is None or self._needs_full_write:
+                # 整体重写意味着状态可能被整体替换过，顺带规范化结构
+                _ensure_schema(state)
+                names = [name for name in state if name != "actions_history"]
+                pipe.delete(self.game_state_key)
+            else:
+                names = [name for name in fields if name in state]
+            
+            mapping = {}
+            for name in names:
+                value = state[name]
+                if name == "tile_pool" and value:
+                    encoded_pool = _encode_tile_pool(value)
+                    if encoded_pool is not None:
+                        value = encoded_pool
+                mapping[name] = _dumps(value)
+            if mapping:
+                pipe.hset(self.game_state_key, mapping=mapping)
+            
+            history = state.get("actions_history")
+            if (history is not None and history is self._persisted_history
+                    and len(history) >= self._persisted_history_len):
+                new_actions = history[self._persisted_history_len:]
+            else:
+                pipe.delete(self.history_key)
+                new_actions = history or []
+            if new_actions:
+                pipe.rpush(self.history_key, *map(_dumps, new_actions))
+            
+            # 先更新已写入的记录再提交，写入失败由_write_failed通知
+            self._needs_full_write = False
+            self._persisted_history = history
+            self._persisted_history_len = len(history) if history is not None else 0
+            _STATE_WRITER.submit(self._execute_write, pipe)
+        except Exception as e:
+            logger.error("保存状态到Redis失败: %s", e)
+            # 本次写入没有提交，下次保存时整体重写
+            self._needs_full_write = True
+            self._persisted_history = None
+    
+    def _execute_write(self, pipe):
+        """在后台线程中执行写入管道"""
         try:
-            state_json = json.dumps(self._game_state)
-            self.redis.set(self.game_state_key, state_json)
+            pipe.execute()
         except Exception as e:
-            print(f"保存状态到Redis失败: {e}")
+            logger.error("保存状态到Redis失败: %s", e)
+            # 本次写入丢失，下次保存时整体重写状态和历史
+            self._write_failed.set()
     
     def get_game_state(self) -> Dict[str, Any]:
         """获取当前游戏状态"""
@@ -69,7 +286,7 @@ class MahjongGameService:
             self._save_state()
             return True
         except Exception as e:
-            print(f"设置游戏状态失败: {e}")
+            logger.error("设置游戏状态失败: %s", e)
             return False
     
     def set_game_state_dict(self, game_state: Dict[str, Any]) -> bool:
@@ -79,7 +296,7 @@ class MahjongGameService:
             self._save_state()
             return True
         except Exception as e:
-            print(f"设置游戏状态失败: {e}")
+            logger.error("设置游戏状态失败: %s", e)
             return False
     
     def reset_game(self) -> None:
@@ -95,27 +312,20 @@ class MahjongGameService:
         """
         try:
             player_id_str = str(player_id)
-            if player_id_str not in self._game_state["player_hands"]:
-                self._game_state["player_hands"][player_id_str] = {
-                    "tiles": [] if player_id == 0 else None,  # 其他玩家不存储具体牌面
-                    "tile_count": 0,  # 新增：手牌数量
-                    "melds": []
-                }
+            hand = self._game_state["player_hands"][player_id_str]
             
             if player_id == 0:
                 # 我：添加具体手牌
-                self._game_state["player_hands"][player_id_str]["tiles"].append({
+                hand["tiles"].append({
                     "type": tile.type,
                     "value": tile.value
                 })
-                self._game_state["player_hands"][player_id_str]["tile_count"] = len(
-                    self._game_state["player_hands"][player_id_str]["tiles"]
-                )
-                print(f"✅ 我（玩家0）添加手牌: {tile.value}{tile.type}")
+                hand["tile_count"] = len(hand["tiles"])
+                logger.debug("✅ 我（玩家0）添加手牌: %s%s", tile.value, tile.type)
             else:
                 # 其他玩家：只增加数量
-                self._game_state["player_hands"][player_id_str]["tile_count"] += 1
-                print(f"✅ 玩家{player_id}手牌数量+1 (当前:{self._game_state['player_hands'][player_id_str]['tile_count']}张)")
+                hand["tile_count"] += 1
+                logger.debug("✅ 玩家%s手牌数量+1 (当前:%s张)", player_id, hand['tile_count'])
             
             # 记录操作历史
             self._game_state["actions_history"].append({
@@ -125,31 +335,24 @@ class MahjongGameService:
                     "type": tile.type,
                     "value": tile.value
                 } if player_id == 0 else None,  # 其他玩家不记录具体牌面
-                "timestamp": datetime.now().timestamp()
+                "timestamp": time.time()
             })
             
-            self._save_state()
+            self._save_state("player_hands")
             return True
         except Exception as e:
-            print(f"添加手牌失败: {e}")
+            logger.error("添加手牌失败: %s", e)
             return False
     
     def discard_tile(self, player_id: int, tile: Tile) -> bool:
         """玩家弃牌"""
         try:
             player_id_str = str(player_id)
-            
-            # 确保玩家有手牌数据结构
-            if player_id_str not in self._game_state["player_hands"]:
-                self._game_state["player_hands"][player_id_str] = {
-                    "tiles": [] if player_id == 0 else None,
-                    "tile_count": 0,
-                    "melds": []
-                }
+            hand = self._game_state["player_hands"][player_id_str]
             
             if player_id == 0:
                 # 我：从具体手牌中移除
-                hand_tiles = self._game_state["player_hands"][player_id_str]["tiles"]
+                hand_tiles = hand["tiles"]
                 found_tile_index = None
                 for i, hand_tile in enumerate(hand_tiles):
                     if hand_tile["type"] == tile.type and hand_tile["value"] == tile.value:
@@ -158,80 +361,75 @@ class MahjongGameService:
                 
                 if found_tile_index is not None:
                     hand_tiles.pop(found_tile_index)
-                    self._game_state["player_hands"][player_id_str]["tile_count"] = len(hand_tiles)
-                    print(f"✅ 我（玩家0）弃牌: {tile.value}{tile.type}")
+                    hand["tile_count"] = len(hand_tiles)
+                    logger.debug("✅ 我（玩家0）弃牌: %s%s", tile.value, tile.type)
                 else:
-                    print(f"⚠️ 我（玩家0）手牌中没有 {tile.value}{tile.type}")
+                    logger.warning("⚠️ 我（玩家0）手牌中没有 %s%s", tile.value, tile.type)
                     return False
             else:
                 # 其他玩家：只减少数量
-                if self._game_state["player_hands"][player_id_str]["tile_count"] > 0:
-                    self._game_state["player_hands"][player_id_str]["tile_count"] -= 1
-                    print(f"✅ 玩家{player_id}弃牌，手牌数量-1 (当前:{self._game_state['player_hands'][player_id_str]['tile_count']}张)")
+                if hand["tile_count"] > 0:
+                    hand["tile_count"] -= 1
+                    logger.debug("✅ 玩家%s弃牌，手牌数量-1 (当前:%s张)", player_id, hand['tile_count'])
                 else:
-                    print(f"⚠️ 玩家{player_id}没有手牌可弃")
+                    logger.warning("⚠️ 玩家%s没有手牌可弃", player_id)
                     return False
             
+            # 牌字典只生成一次，弃牌池和操作历史共用（之后不会被原地修改）
+            tile_dict = tile.dict()
+            
             # 添加到弃牌池（所有弃牌都是可见的）
-            self._game_state["discarded_tiles"].append(tile.dict())
+            self._game_state["discarded_tiles"].append(tile_dict)
             
             # 添加到玩家弃牌池
-            if player_id_str not in self._game_state["player_discarded_tiles"]:
-                self._game_state["player_discarded_tiles"][player_id_str] = []
-            self._game_state["player_discarded_tiles"][player_id_str].append(tile.dict())
+            self._game_state["player_discarded_tiles"][player_id_str].append(tile_dict)
             
             # 记录操作历史
             self._game_state["actions_history"].append({
                 "player_id": player_id,
                 "action_type": "discard",
-                "tile": tile.dict(),  # 弃牌对所有人可见
-                "timestamp": datetime.now().timestamp()
+                "tile": tile_dict,  # 弃牌对所有人可见
+                "timestamp": time.time()
             })
             
-            self._save_state()
+            self._save_state("player_hands", "discarded_tiles", "player_discarded_tiles")
             return True
         except Exception as e:
-            print(f"弃牌失败: {e}")
+            logger.error("弃牌失败: %s", e)
             return False
     
     def process_operation(self, request: TileOperationRequest) -> Tuple[bool, str]:
         """处理游戏操作"""
         try:
-            if request.operation_type == "hand":
-                # 添加手牌
-                success = self.add_tile_to_hand(request.player_id, request.tile)
-                return success, "添加手牌成功" if success else "添加手牌失败"
+            with self._batch_save():
+                # 一次操作可能经过多个内部步骤，统一在结束时保存一次
+                if request.operation_type == "hand":
+                    # 添加手牌
+                    success = self.add_tile_to_hand(request.player_id, request.tile)
+                    return success, "添加手牌成功" if success else "添加手牌失败"
                 
-            elif request.operation_type == "discard":
-                # 弃牌
-                success = self.discard_tile(request.player_id, request.tile)
-                return success, "弃牌成功" if success else "弃牌失败"
+                elif request.operation_type == "discard":
+                    # 弃牌
+                    success = self.discard_tile(request.player_id, request.tile)
+                    return success, "弃牌成功" if success else "弃牌失败"
                 
-            elif request.operation_type == "peng":
-                # 碰牌
-                return self._handle_peng(request)
+                elif request.operation_type == "peng":
+                    # 碰牌
+                    return self._handle_peng(request)
                 
-            elif request.operation_type in ["angang", "zhigang", "jiagang"]:
-                # 杠牌
-                return self._handle_gang(request)
+                elif request.operation_type in ["angang", "zhigang", "jiagang"]:
+                    # 杠牌
+                    return self._handle_gang(request)
                 
-            else:
-                return False, f"不支持的操作类型: {request.operation_type}"
+                else:
+                    return False, f"不支持的操作类型: {request.operation_type}"
                 
         except Exception as e:
             return False, f"操作失败: {str(e)}"
     
     def _initialize_tile_pool(self) -> List[Dict]:
         """初始化牌库"""
-        tiles = []
-        for tile_type in ["wan", "tiao", "tong"]:
-            for value in range(1, 10):
-                for _ in range(4):  # 每种牌4张
-                    tiles.append({
-                        "type": tile_type,
-                        "value": value
-                    })
-        return tiles
+        return list(_TILE_POOL_TEMPLATE)
     
     def _create_initial_state(self) -> Dict[str, Any]:
         """创建初始游戏状态"""
@@ -252,19 +450,14 @@ class MahjongGameService:
             "game_started": False,  # 游戏是否开始
             "last_action": None,  # 最后一个动作
             "tile_pool": self._initialize_tile_pool(),  # 牌池
-            "players": {  # 玩家信息
-                "0": {"position": "我"},
-                "1": {"position": "下家"},
-                "2": {"position": "对家"},
-                "3": {"position": "上家"}
-            }
+            "players": _PLAYERS_TEMPLATE  # 玩家信息
         }
     
     def start_game(self) -> Tuple[bool, str]:
         """开始游戏"""
         try:
             self._game_state["game_started"] = True
-            self._save_state()
+            self._save_state("game_started")
             return True, "游戏开始"
         except Exception as e:
             return False, f"开始游戏失败: {str(e)}"
@@ -276,20 +469,18 @@ class MahjongGameService:
                 return False, "牌库已空", None
             
             tile = self._game_state["tile_pool"].pop()
-            player_id_str = str(player_id)
+            hand = self._game_state["player_hands"][str(player_id)]
             
             if player_id == 0:
                 # 我：添加具体牌面到手牌
-                self._game_state["player_hands"][player_id_str]["tiles"].append(tile)
-                self._game_state["player_hands"][player_id_str]["tile_count"] = len(
-                    self._game_state["player_hands"][player_id_str]["tiles"]
-                )
-                print(f"✅ 我（玩家0）摸牌: {tile['value']}{tile['type']}")
+                hand["tiles"].append(tile)
+                hand["tile_count"] = len(hand["tiles"])
+                logger.debug("✅ 我（玩家0）摸牌: %s%s", tile['value'], tile['type'])
                 return True, "摸牌成功", tile
             else:
                 # 其他玩家：只增加手牌数量
-                self._game_state["player_hands"][player_id_str]["tile_count"] += 1
-                print(f"✅ 玩家{player_id}摸牌，手牌数量+1 (当前:{self._game_state['player_hands'][player_id_str]['tile_count']}张)")
+                hand["tile_count"] += 1
+                logger.debug("✅ 玩家%s摸牌，手牌数量+1 (当前:%s张)", player_id, hand['tile_count'])
                 return True, "摸牌成功", None  # 不返回具体牌面
                 
         except Exception as e:
@@ -301,101 +492,94 @@ class MahjongGameService:
         return success, "弃牌成功" if success else "弃牌失败"
     
     def _remove_tiles_from_my_hand(self, tile: Tile, count: int) -> int:
-        """从我的手牌中移除指定数量的牌"""
-        player_hand = self._game_state["player_hands"]["0"]["tiles"]
+        """从我的手牌中移除指定数量的牌（不足时一张都不移除）"""
+        my_hand = self._game_state["player_hands"]["0"]
+        player_hand = my_hand["tiles"]
+        tile_type, tile_value = tile.type, tile.value
         
-        removed = 0
-        for i in range(len(player_hand) - 1, -1, -1):  # 从后往前遍历
-            if removed >= count:
+        # 从后往前找出要移除的位置，再一次性重建手牌，避免逐张pop反复移动后续元素
+        removed_indices = set()
+        for i in range(len(player_hand) - 1, -1, -1):
+            if len(removed_indices) >= count:
                 break
             hand_tile = player_hand[i]
-            if (hand_tile["type"] == tile.type and 
-                hand_tile["value"] == tile.value):
-                player_hand.pop(i)
-                removed += 1
-                print(f"🗑️ 从我的手牌移除{tile.value}{tile.type} ({removed}/{count})")
+            if hand_tile["type"] == tile_type and hand_tile["value"] == tile_value:
+                removed_indices.add(i)
+        
+        removed = len(removed_indices)
+        if removed < count:
+            # 数量不足时不动手牌，调用方据返回值判定操作失败
+            return removed
+        player_hand[:] = [t for i, t in enumerate(player_hand) if i not in removed_indices]
+        logger.debug("🗑️ 从我的手牌移除%s%s (%s/%s)", tile.value, tile.type, removed, count)
         
         # 更新手牌数量
-        self._game_state["player_hands"]["0"]["tile_count"] = len(player_hand)
+        my_hand["tile_count"] = len(player_hand)
         return removed
     
     def _reduce_other_player_hand_count(self, player_id: int, count: int):
         """减少其他玩家的手牌数量"""
-        player_id_str = str(player_id)
-        current_count = self._game_state["player_hands"][player_id_str]["tile_count"]
+        hand = self._game_state["player_hands"][str(player_id)]
+        current_count = hand["tile_count"]
         new_count = max(0, current_count - count)
-        self._game_state["player_hands"][player_id_str]["tile_count"] = new_count
-        print(f"🔢 玩家{player_id}手牌数量: {current_count} → {new_count} (减少{count}张)")
+        hand["tile_count"] = new_count
+        logger.debug("🔢 玩家%s手牌数量: %s → %s (减少%s张)", player_id, current_count, new_count, count)
     
     def _auto_draw_tile_for_player(self, player_id: int):
         """为玩家自动摸一张牌"""
         if self._game_state["tile_pool"]:
             tile = self._game_state["tile_pool"].pop()
+            hand = self._game_state["player_hands"][str(player_id)]
             
             if player_id == 0:
                 # 我：添加具体牌面
-                self._game_state["player_hands"]["0"]["tiles"].append(tile)
-                self._game_state["player_hands"]["0"]["tile_count"] = len(
-                    self._game_state["player_hands"]["0"]["tiles"]
-                )
-                print(f"🎯 我（玩家0）自动摸牌: {tile['value']}{tile['type']}")
+                hand["tiles"].append(tile)
+                hand["tile_count"] = len(hand["tiles"])
+                logger.debug("🎯 我（玩家0）自动摸牌: %s%s", tile['value'], tile['type'])
             else:
                 # 其他玩家：只增加数量
-                self._game_state["player_hands"][str(player_id)]["tile_count"] += 1
-                print(f"🎯 玩家{player_id}自动摸牌，手牌数量+1")
+                hand["tile_count"] += 1
+                logger.debug("🎯 玩家%s自动摸牌，手牌数量+1", player_id)
             
             return tile
         else:
-            print(f"⚠️ 牌库已空，无法为玩家{player_id}摸牌")
+            logger.warning("⚠️ 牌库已空，无法为玩家%s摸牌", player_id)
             return None
 
+    @staticmethod
+    def _pop_last_matching(tiles: List[Dict], tile: Tile) -> Optional[Dict]:
+        """从后往前查找最近一张相同的牌并移除，找不到时返回None"""
+        tile_type, tile_value = tile.type, tile.value
+        for i in range(len(tiles) - 1, -1, -1):
+            candidate = tiles[i]
+            if candidate["type"] == tile_type and candidate["value"] == tile_value:
+                # 被碰/杠的牌几乎总在末尾，pop基本不需要移动元素
+                return tiles.pop(i)
+        return None
+
     def _remove_tile_from_discard_pile(self, player_id: int, tile: Tile):
         """从指定玩家的弃牌堆中移除指定的牌"""
         try:
             player_id_str = str(player_id)
             
-            # 确保弃牌堆存在
-            if "player_discarded_tiles" not in self._game_state:
-                self._game_state["player_discarded_tiles"] = {}
-            
-            if player_id_str not in self._game_state["player_discarded_tiles"]:
-                self._game_state["player_discarded_tiles"][player_id_str] = []
-                return
-            
             discarded_tiles = self._game_state["player_discarded_tiles"][player_id_str]
             
-            # 从后往前查找最新弃出的相同牌（通常被碰/杠的是最后弃出的牌）
-            for i in range(len(discarded_tiles) - 1, -1, -1):
-                discarded_tile = discarded_tiles[i]
-                if (discarded_tile["type"] == tile.type and 
-                    discarded_tile["value"] == tile.value):
-                    # 找到匹配的牌，移除它
-                    removed_tile = discarded_tiles.pop(i)
-                    print(f"🗑️ 从玩家{player_id}弃牌堆移除: {removed_tile['value']}{removed_tile['type']}")
-                    break
-            else:
-                print(f"⚠️ 警告：在玩家{player_id}弃牌堆中未找到 {tile.value}{tile.type}")
+            # 查找最新弃出的相同牌（通常被碰/杠的是最后弃出的牌）
+            removed_tile = self._pop_last_matching(discarded_tiles, tile)
+            if removed_tile is None:
+                logger.warning("⚠️ 警告：在玩家%s弃牌堆中未找到 %s%s", player_id, tile.value, tile.type)
                 return
+            logger.debug("🗑️ 从玩家%s弃牌堆移除: %s%s", player_id, removed_tile['value'], removed_tile['type'])
             
             # 🔧 修复：同时从全局弃牌堆中移除被碰/杠的牌
-            if "discarded_tiles" not in self._game_state:
-                self._game_state["discarded_tiles"] = []
-            
-            # 从后往前查找并移除全局弃牌堆中的对应牌
-            global_discarded = self._game_state["discarded_tiles"]
-            for i in range(len(global_discarded) - 1, -1, -1):
-                global_tile = global_discarded[i]
-                if (global_tile["type"] == tile.type and 
-                    global_tile["value"] == tile.value):
-                    # 找到匹配的牌，移除它
-                    removed_global_tile = global_discarded.pop(i)
-                    print(f"🌍 从全局弃牌堆移除: {removed_global_tile['value']}{removed_global_tile['type']}")
-                    break
+            removed_global_tile = self._pop_last_matching(self._game_state["discarded_tiles"], tile)
+            if removed_global_tile is None:
+                logger.warning("⚠️ 警告：在全局弃牌堆中未找到 %s%s", tile.value, tile.type)
             else:
-                print(f"⚠️ 警告：在全局弃牌堆中未找到 {tile.value}{tile.type}")
+                logger.debug("🌍 从全局弃牌堆移除: %s%s", removed_global_tile['value'], removed_global_tile['type'])
             
         except Exception as e:
-            print(f"❌ 从弃牌堆移除牌失败: {e}")
+            logger.error("从弃牌堆移除牌失败: %s", e)
     
     def _handle_peng(self, request: TileOperationRequest) -> Tuple[bool, str]:
         """处理碰牌操作
@@ -408,14 +592,7 @@ class MahjongGameService:
             player_id = request.player_id
             player_id_str = str(player_id)
             
-            # 确保玩家手牌结构存在
-            if player_id_str not in self._game_state["player_hands"]:
-                if player_id == 0:
-                    self._game_state["player_hands"][player_id_str] = {"tiles": [], "tile_count": 0, "melds": []}
-                else:
-                    self._game_state["player_hands"][player_id_str] = {"tiles": None, "tile_count": 0, "melds": []}
-            
-            print(f"🀄 玩家{player_id}碰牌{request.tile.value}{request.tile.type}")
+            logger.debug("🀄 玩家%s碰牌%s%s", player_id, request.tile.value, request.tile.type)
             
             if player_id == 0:
                 # 我：检查并移除手牌中的2张牌
@@ -424,26 +601,23 @@ class MahjongGameService:
                     return False, f"手牌中没有足够的{request.tile.value}{request.tile.type}进行碰牌"
                 
                 # 注意：不在这里自动出牌，由外部调用弃牌API处理
-                print(f"🎯 我碰牌完成，手牌中移除了2张{request.tile.value}{request.tile.type}")
+                logger.debug("🎯 我碰牌完成，手牌中移除了2张%s%s", request.tile.value, request.tile.type)
                 
             else:
                 # 其他玩家：只减少手牌数量2张（手中用掉的牌）
                 self._reduce_other_player_hand_count(player_id, 2)
             
             # 创建碰牌组（对所有人可见）
+            tile_dict = request.tile.dict()
             meld = {
-                "id": str(uuid.uuid4()),
+                "id": uuid.uuid4().hex,
                 "type": "peng",
-                "tiles": [
-                    request.tile.dict(),
-                    request.tile.dict(),
-                    request.tile.dict()
-                ],
+                "tiles": [tile_dict] * 3,
                 "exposed": True,
                 "gang_type": None,
                 "source_player": request.source_player_id,
                 "original_peng_id": None,
-                "timestamp": datetime.now().timestamp()
+                "timestamp": time.time()
             }
             
             # 从被碰玩家的弃牌堆中移除被碰的牌
@@ -454,28 +628,37 @@ class MahjongGameService:
             self._game_state["player_hands"][player_id_str]["melds"].append(meld)
             
             # 记录操作历史
-            if "actions_history" not in self._game_state:
-                self._game_state["actions_history"] = []
-            
             action = {
                 "player_id": request.player_id,
                 "action_type": "peng",
-                "tile": request.tile.dict(),  # 碰牌操作对所有人可见
+                "tile": tile_dict,  # 碰牌操作对所有人可见
                 "source_player": request.source_player_id,
-                "timestamp": datetime.now().timestamp()
+                "timestamp": time.time()
             }
             self._game_state["actions_history"].append(action)
             
-            print(f"✅ 玩家{player_id}碰牌完成")
+            logger.debug("✅ 玩家%s碰牌完成", player_id)
             
             # 保存状态
-            self._save_state()
+            self._save_state("player_hands", "discarded_tiles", "player_discarded_tiles")
             return True, "碰牌成功"
             
         except Exception as e:
-            print(f"碰牌失败: {e}")
+            logger.error("碰牌失败: %s", e)
             return False, f"碰牌失败: {str(e)}"
     
+    @staticmethod
+    def _find_peng_index(melds: List[Dict], tile: Tile) -> Optional[int]:
+        """查找与指定牌相同的碰牌组位置，找不到时返回None"""
+        tile_type, tile_value = tile.type, tile.value
+        for i, meld_item in enumerate(melds):
+            if meld_item["type"] != "peng" or not meld_item["tiles"]:
+                continue
+            first_tile = meld_item["tiles"][0]
+            if first_tile["type"] == tile_type and first_tile["value"] == tile_value:
+                return i
+        return None
+
     def _handle_gang(self, request: TileOperationRequest) -> Tuple[bool, str]:
         """处理杠牌操作
         
@@ -488,13 +671,6 @@ class MahjongGameService:
             player_id = request.player_id
             player_id_str = str(player_id)
             
-            # 确保玩家手牌结构存在
-            if player_id_str not in self._game_state["player_hands"]:
-                if player_id == 0:
-                    self._game_state["player_hands"][player_id_str] = {"tiles": [], "tile_count": 0, "melds": []}
-                else:
-                    self._game_state["player_hands"][player_id_str] = {"tiles": None, "tile_count": 0, "melds": []}
-            
             # 根据operation_type确定杠牌类型
             gang_type_map = {
                 "angang": "an_gang",
@@ -503,7 +679,7 @@ class MahjongGameService:
             }
             
             gang_type = gang_type_map.get(request.operation_type, "an_gang")
-            print(f"🀄 玩家{player_id}{gang_type}杠牌{request.tile.value}{request.tile.type}")
+            logger.debug("🀄 玩家%s%s杠牌%s%s", player_id, gang_type, request.tile.value, request.tile.type)
             
             # 处理不同类型的杠牌
             original_peng_id = None
@@ -512,16 +688,14 @@ class MahjongGameService:
             
             if request.operation_type == "jiagang":
                 # 加杠：查找已有的碰牌并移除
-                for meld_item in self._game_state["player_hands"][player_id_str]["melds"]:
-                    if (meld_item["type"] == "peng" and 
-                        len(meld_item["tiles"]) > 0 and
-                        meld_item["tiles"][0]["type"] == request.tile.type and
-                        meld_item["tiles"][0]["value"] == request.tile.value):
-                        original_peng_id = meld_item["id"]
-                        original_source_player = meld_item.get("source_player")  # 保存原始碰牌的来源
-                        self._game_state["player_hands"][player_id_str]["melds"].remove(meld_item)
-                        print(f"🔄 移除原有碰牌组{original_peng_id}，原始来源：玩家{original_source_player}")
-                        break
+                melds = self._game_state["player_hands"][player_id_str]["melds"]
+                peng_index = self._find_peng_index(melds, request.tile)
+                if peng_index is not None:
+                    # 按位置移除，避免list.remove逐个比较整个副露字典
+                    meld_item = melds.pop(peng_index)
+                    original_peng_id = meld_item["id"]
+                    original_source_player = meld_item.get("source_player")  # 保存原始碰牌的来源
+                    logger.debug("🔄 移除原有碰牌组%s，原始来源：玩家%s", original_peng_id, original_source_player)
                 
                 # 加杠：从手牌移除1张牌，摸1张牌
                 if player_id == 0:
@@ -568,15 +742,11 @@ class MahjongGameService:
                 # 注意：直杠后的出牌在外部API调用中单独处理，这里不自动出牌
             
             # 创建杠牌组
+            tile_dict = request.tile.dict()
             meld = {
-                "id": str(uuid.uuid4()),
+                "id": uuid.uuid4().hex,
                 "type": "gang",
-                "tiles": [
-                    request.tile.dict(),
-                    request.tile.dict(),
-                    request.tile.dict(),
-                    request.tile.dict()
-                ],
+                "tiles": [tile_dict] * 4,
                 "exposed": exposed,
                 "gang_type": gang_type,
                 "source_player": (
@@ -585,38 +755,35 @@ class MahjongGameService:
                     else None
                 ),
                 "original_peng_id": original_peng_id,
-                "timestamp": datetime.now().timestamp()
+                "timestamp": time.time()
             }
             
             # 添加到玩家的melds中
             self._game_state["player_hands"][player_id_str]["melds"].append(meld)
-            print(f"🔧 创建杠牌组：type={meld['type']}, gang_type={meld['gang_type']}, source_player={meld['source_player']}")
+            logger.debug("🔧 创建杠牌组：type=%s, gang_type=%s, source_player=%s", meld['type'], meld['gang_type'], meld['source_player'])
             
             # 记录操作历史
-            if "actions_history" not in self._game_state:
-                self._game_state["actions_history"] = []
-            
             action = {
                 "player_id": request.player_id,
                 "action_type": f"gang_{gang_type}",
-                "tile": request.tile.dict() if exposed else None,  # 暗杠不记录具体牌面
+                "tile": tile_dict if exposed else None,  # 暗杠不记录具体牌面
                 "source_player": (
                     request.source_player_id if gang_type == "ming_gang" 
                     else original_source_player if gang_type == "jia_gang" 
                     else None
                 ),
-                "timestamp": datetime.now().timestamp()
+                "timestamp": time.time()
             }
             self._game_state["actions_history"].append(action)
             
-            print(f"✅ 玩家{player_id}杠牌完成 ({gang_type})")
+            logger.debug("✅ 玩家%s杠牌完成 (%s)", player_id, gang_type)
             
             # 保存状态
-            self._save_state()
+            self._save_state("player_hands", "discarded_tiles", "player_discarded_tiles", "tile_pool")
             return True, f"杠牌成功 ({gang_type})"
             
         except Exception as e:
-            print(f"杠牌失败: {e}")
+            logger.error("杠牌失败: %s", e)
             return False, f"杠牌失败: {str(e)}"
 
     # ============ 定缺相关方法 ============
@@ -627,43 +794,30 @@ class MahjongGameService:
             player_id_str = str(player_id)
             
             # 验证花色
-            valid_suits = ["wan", "tiao", "tong"]
-            if missing_suit not in valid_suits:
-                print(f"❌ 无效的定缺花色: {missing_suit}")
+            if missing_suit not in _VALID_SUITS:
+                logger.warning("❌ 无效的定缺花色: %s", missing_suit)
                 return False
             
-            # 确保玩家手牌结构存在
-            if player_id_str not in self._game_state["player_hands"]:
-                self._game_state["player_hands"][player_id_str] = {
-                    "tiles": [] if player_id == 0 else None,
-                    "tile_count": 0,
-                    "melds": [],
-                    "missing_suit": None
-                }
-            
             # 设置定缺
             self._game_state["player_hands"][player_id_str]["missing_suit"] = missing_suit
             
             # 记录操作历史
-            if "actions_history" not in self._game_state:
-                self._game_state["actions_history"] = []
-            
             action = {
                 "player_id": player_id,
                 "action_type": "missing_suit",
                 "missing_suit": missing_suit,
-                "timestamp": datetime.now().timestamp()
+                "timestamp": time.time()
             }
             self._game_state["actions_history"].append(action)
             
-            print(f"✅ 玩家{player_id}定缺设置成功: {missing_suit}")
+            logger.debug("✅ 玩家%s定缺设置成功: %s", player_id, missing_suit)
             
             # 保存状态
-            self._save_state()
+            self._save_state("player_hands")
             return True
             
         except Exception as e:
-            print(f"设置定缺失败: {e}")
+            logger.error("设置定缺失败: %s", e)
             return False
 
     def get_player_missing_suit(self, player_id: int) -> Optional[str]:
@@ -674,7 +828,7 @@ class MahjongGameService:
                 return self._game_state["player_hands"][player_id_str].get("missing_suit")
             return None
         except Exception as e:
-            print(f"获取定缺失败: {e}")
+            logger.error("获取定缺失败: %s", e)
             return None
 
     def get_all_missing_suits(self) -> Dict[str, Optional[str]]:
@@ -685,7 +839,7 @@ class MahjongGameService:
                 missing_suits[player_id_str] = hand.get("missing_suit")
             return missing_suits
         except Exception as e:
-            print(f"获取所有定缺信息失败: {e}")
+            logger.error("获取所有定缺信息失败: %s", e)
             return {}
 
     def reset_all_missing_suits(self) -> bool:
@@ -694,14 +848,14 @@ class MahjongGameService:
             for player_id_str, hand in self._game_state.get("player_hands", {}).items():
                 hand["missing_suit"] = None
             
-            print("✅ 所有玩家定缺已重置")
+            logger.debug("✅ 所有玩家定缺已重置")
             
             # 保存状态
-            self._save_state()
+            self._save_state("player_hands")
             return True
             
         except Exception as e:
-            print(f"重置所有定缺失败: {e}")
+            logger.error("重置所有定缺失败: %s", e)
             return False
 
     def is_tile_missing_suit(self, player_id: int, tile: Tile) -> bool:
@@ -712,5 +866,5 @@ class MahjongGameService:
                 return False
             return tile.type == missing_suit
         except Exception as e:
-            print(f"检查定缺失败: {e}")
+            logger.error("检查定缺失败: %s", e)
             return False 
\ No newline at end of file
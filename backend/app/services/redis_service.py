@@ -1,53 +1,85 @@
 import redis
 import json
 import logging
-from typing import Any, Optional, Dict
+import time
+from typing import Any, Optional, Dict, List, Iterator
 from app.core.config import settings
 
 logger = logging.getLogger(__name__)
 
+# 连接检查结果的有效期（秒），期间重复检查不再发送PING
+_PING_CACHE_TTL = 1.0
+
+def _decode(value):
+    """客户端返回原始字节，需要字符串的地方（键名、字段名、成员）在这里解码"""
+    return value.decode('utf-8') if isinstance(value, bytes) else value
+
+def _decode_hash(data: Dict[bytes, bytes]) -> Dict[str, Any]:
+    """解码哈希字段名，字段值尝试按JSON解析"""
+    result = {}
+    for field, value in data.items():
+        try:
+            result[_decode(field)] = json.loads(value)
+        except ValueError:
+            result[_decode(field)] = _decode(value)
+    return result
+
 class RedisService:
     """Redis服务类，管理Redis连接和基本操作"""
     
     def __init__(self):
         self.redis_client = None
+        self._last_ping_ok = False
+        self._last_ping_ts = float("-inf")
         self._initialize_connection()
     
     def _initialize_connection(self):
         """初始化Redis连接"""
+        # 连接池只创建一次，由全局实例在所有请求间复用；
+        # 连接数达到上限时阻塞等待空闲连接，而不是无限制地新建连接
+        pool = redis.BlockingConnectionPool(
+            host=getattr(settings, 'REDIS_HOST', 'localhost'),
+            port=getattr(settings, 'REDIS_PORT', 6379),
+            db=getattr(settings, 'REDIS_DB', 0),
+            password=getattr(settings, 'REDIS_PASSWORD', None),
+            # 值以原始字节返回，牌谱等JSON直接交给解析器，不再先解码成字符串
+            decode_responses=False,
+            socket_connect_timeout=5,
+            socket_timeout=5,
+            max_connections=50,
+            timeout=5
+        )
+        self.redis_client = redis.Redis(connection_pool=pool)
         try:
-            self.redis_client = redis.Redis(
-                host=getattr(settings, 'REDIS_HOST', 'localhost'),
-                port=getattr(settings, 'REDIS_PORT', 6379),
-                db=getattr(settings, 'REDIS_DB', 0),
-                password=getattr(settings, 'REDIS_PASSWORD', None),
-                decode_responses=True,
-                socket_connect_timeout=5,
-                socket_timeout=5
-            )
-            # 测试连接
+            # 测试连接；失败时保留客户端，Redis恢复后连接池会自动重连
             self.redis_client.ping()
             logger.info("Redis连接成功")
         except Exception as e:
             logger.warning(f"Redis连接失败: {e}")
-            self.redis_client = None
     
     def is_connected(self) -> bool:
-        """检查Redis连接状态"""
+        """检查Redis连接状态，结果缓存_PING_CACHE_TTL秒"""
+        # 只用于显式检查；读写操作不预先PING，连接异常由各操作捕获并返回默认值
         if not self.redis_client:
             return False
+        now = time.monotonic()
+        if now - self._last_ping_ts < _PING_CACHE_TTL:
+            return self._last_ping_ok
         try:
             self.redis_client.ping()
-            return True
+            self._last_ping_ok = True
         except:
-            return False
+            self._last_ping_ok = False
+        self._last_ping_ts = now
+        return self._last_ping_ok
+    
+    def _mark_disconnected(self, error: Exception):
+        """连接类错误使缓存的检查结果失效，下次检查重新PING"""
+        if isinstance(error, (redis.ConnectionError, redis.TimeoutError)):
+            self._last_ping_ts = float("-inf")
     
     def set(self, key: str, value: Any, expire: Optional[int] = None) -> bool:
         """设置键值对"""
-        if not self.is_connected():
-            logger.warning("Redis未连接，无法设置值")
-            return False
-        
         try:
             # 如果是字典或列表，转换为JSON字符串
             if isinstance(value, (dict, list)):
@@ -59,57 +91,46 @@ class RedisService:
             result = self.redis_client.set(key, value, ex=expire)
             return bool(result)
         except Exception as e:
+            self._mark_disconnected(e)
             logger.error(f"Redis设置失败: {e}")
             return False
     
-    def get(self, key: str) -> Optional[Any]:
-        """获取值"""
-        if not self.is_connected():
-            logger.warning("Redis未连接，无法获取值")
-            return None
-        
+    def get(self, key: str) -> Optional[bytes]:
+        """获取值（原始字节）"""
         try:
             value = self.redis_client.get(key)
             if value is None:
                 return None
             
-            # 直接返回字符串，不进行JSON解析
+            # 直接返回原始字节，不进行JSON解析
             # 让调用方决定是否解析JSON
             return value
         except Exception as e:
+            self._mark_disconnected(e)
             logger.error(f"Redis获取失败: {e}")
             return None
     
     def delete(self, key: str) -> bool:
         """删除键"""
-        if not self.is_connected():
-            logger.warning("Redis未连接，无法删除值")
-            return False
-        
         try:
             result = self.redis_client.delete(key)
             return bool(result)
         except Exception as e:
+            self._mark_disconnected(e)
             logger.error(f"Redis删除失败: {e}")
             return False
     
     def exists(self, key: str) -> bool:
         """检查键是否存在"""
-        if not self.is_connected():
-            return False
-        
         try:
             return bool(self.redis_client.exists(key))
         except Exception as e:
+            self._mark_disconnected(e)
             logger.error(f"Redis检查存在失败: {e}")
             return False
     
     def hset(self, hash_key: str, field: str, value: Any) -> bool:
         """设置哈希字段"""
-        if not self.is_connected():
-            logger.warning("Redis未连接，无法设置哈希值")
-            return False
-        
         try:
             if isinstance(value, (dict, list)):
                 value = json.dumps(value)
@@ -117,15 +138,12 @@ class RedisService:
             result = self.redis_client.hset(hash_key, field, value)
             return bool(result)
         except Exception as e:
+            self._mark_disconnected(e)
             logger.error(f"Redis哈希设置失败: {e}")
             return False
     
     def hget(self, hash_key: str, field: str) -> Optional[Any]:
         """获取哈希字段值"""
-        if not self.is_connected():
-            logger.warning("Redis未连接，无法获取哈希值")
-            return None
-        
         try:
             value = self.redis_client.hget(hash_key, field)
             if value is None:
@@ -134,42 +152,83 @@ class RedisService:
             # 尝试解析JSON
             try:
                 return json.loads(value)
-            except json.JSONDecodeError:
-                return value
+            except ValueError:
+                return _decode(value)
         except Exception as e:
+            self._mark_disconnected(e)
             logger.error(f"Redis哈希获取失败: {e}")
             return None
     
     def hgetall(self, hash_key: str) -> Dict[str, Any]:
         """获取哈希所有字段"""
-        if not self.is_connected():
-            logger.warning("Redis未连接，无法获取哈希所有值")
-            return {}
-        
         try:
-            data = self.redis_client.hgetall(hash_key)
-            result = {}
-            for field, value in data.items():
-                try:
-                    result[field] = json.loads(value)
-                except json.JSONDecodeError:
-                    result[field] = value
-            return result
+            return _decode_hash(self.redis_client.hgetall(hash_key))
         except Exception as e:
+            self._mark_disconnected(e)
             logger.error(f"Redis哈希获取所有值失败: {e}")
             return {}
     
     def keys(self, pattern: str) -> list:
         """获取匹配模式的键列表"""
+        try:
+            return [_decode(key) for key in self.redis_client.keys(pattern)]
+        except Exception as e:
+            self._mark_disconnected(e)
+            logger.error(f"Redis获取键列表失败: {e}")
+            return []
+
+    def scan_iter(self, match: str, count: int = 500) -> Iterator[str]:
+        """以游标方式遍历匹配模式的键（不阻塞Redis）"""
+        try:
+            for key in self.redis_client.scan_iter(match=match, count=count):
+                yield _decode(key)
+        except Exception as e:
+            self._mark_disconnected(e)
+            logger.error(f"Redis遍历键失败: {e}")
+    
+    def mget(self, keys: List[str]) -> List[Optional[bytes]]:
+        """批量获取值（原始字节），单次往返"""
+        if not keys:
+            return []
+        try:
+            return self.redis_client.mget(keys)
+        except Exception as e:
+            self._mark_disconnected(e)
+            logger.error(f"Redis批量获取失败: {e}")
+            return [None] * len(keys)
+
+    def pipeline(self):
+        """创建非事务管道，批量命令单次往返；未连接时返回None"""
         if not self.is_connected():
-            logger.warning("Redis未连接，无法获取键列表")
+            logger.warning("Redis未连接，无法创建管道")
+            return None
+        return self.redis_client.pipeline(transaction=False)
+    
+    def zrevrange(self, key: str, start: int, end: int) -> list:
+        """按分数从高到低获取有序集合成员"""
+        try:
+            return [_decode(member) for member in self.redis_client.zrevrange(key, start, end)]
+        except Exception as e:
+            self._mark_disconnected(e)
+            logger.error(f"Redis获取有序集合失败: {e}")
+            return []
+    
+    def hgetall_many(self, hash_keys: List[str]) -> List[Dict[str, Any]]:
+        """通过管道批量获取多个哈希的所有字段"""
+        if not hash_keys:
             return []
+        pipe = self.pipeline()
+        if pipe is None:
+            return [{} for _ in hash_keys]
         
         try:
-            return self.redis_client.keys(pattern)
+            for hash_key in hash_keys:
+                pipe.hgetall(hash_key)
+            return [_decode_hash(data) for data in pipe.execute()]
         except Exception as e:
-            logger.error(f"Redis获取键列表失败: {e}")
-            return []
+            self._mark_disconnected(e)
+            logger.error(f"Redis批量获取哈希失败: {e}")
+            return [{} for _ in hash_keys]
 
 # 创建全局Redis服务实例
 redis_service = RedisService() 
\ No newline at end of file
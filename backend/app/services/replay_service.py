@@ -1,22 +1,394 @@
 import json
+import asyncio
 import zipfile
 import io
-from typing import List, Optional, Dict, Any
+import logging
+import hashlib
+import time
+from collections import OrderedDict
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import List, Optional, Dict, Any, Tuple, Iterator
 from datetime import datetime, timedelta
 from pathlib import Path
 
+try:
+    import orjson
+except ImportError:  # orjson为可选依赖，缺失时退回标准库json
+    orjson = None
+
 from app.models.game_record import (
     GameRecord, GameAction, PlayerGameRecord, 
-    GameReplay, ActionType, MahjongCard, GangType
+    GameReplay, ActionType, MahjongCard, GangType, GameRecordStatsDoc
 )
 from app.services.redis_service import RedisService
+from pydantic import TypeAdapter
+
+logger = logging.getLogger(__name__)
+
+# 关键操作：记录时保存状态快照，统计时列入时间线
+KEY_ACTIONS = frozenset({ActionType.PENG, ActionType.GANG, ActionType.HU, ActionType.MISSING_SUIT})
+
+# 需要计数的操作类型 -> 玩家统计字段
+PLAYER_STAT_FIELDS = {
+    ActionType.DRAW: "draw_count",
+    ActionType.DISCARD: "discard_count",
+    ActionType.PENG: "peng_count",
+    ActionType.GANG: "gang_count",
+}
+
+# 操作类型的整数编码，统计时用定长列表计数
+ACTION_NAMES = [action_type.value for action_type in ActionType]
+ACTION_CODES = {name: code for code, name in enumerate(ACTION_NAMES)}
+KEY_ACTION_CODES = frozenset(ACTION_CODES[action_type.value] for action_type in KEY_ACTIONS)
+
+# 统计文档解析器，只校验统计所需字段，操作行解析为字典
+_STATS_DOC_ADAPTER = TypeAdapter(GameRecordStatsDoc)
+# 完整牌谱解析器，模块加载时构建一次
+_GAME_RECORD_ADAPTER = TypeAdapter(GameRecord)
+
+def _parse_game_records(game_datas: List[Optional[bytes]]) -> List[GameRecord]:
+    """批量解析牌谱JSON，跳过缺失或损坏的记录"""
+    records = []
+    for game_data in game_datas:
+        if not game_data:
+            continue
+        try:
+            records.append(_GAME_RECORD_ADAPTER.validate_json(game_data))
+        except:
+            continue
+    return records
+
+# 按开始时间排序的游戏ID索引
+GAMES_BY_TIME_KEY = "games_by_time"
+
+def player_games_key(player_name: str) -> str:
+    """玩家参与的游戏ID索引（按开始时间排序）"""
+    return f"player_games:{player_name}"
+
+# 按玩家查找历史时每次从索引读取的游戏数
+_HISTORY_PAGE_SIZE = 100
+
+# 建立索引前保存的牌谱（以及不过期的标准格式导入）没有摘要和索引，
+# 每个进程在列表不满一页时扫描补建一次
+_game_index_backfilled = False
+_game_index_lock = asyncio.Lock()
+
+# 单个服务实例在内存中保留的进行中游戏数上限，超出时移出最久没有操作的游戏
+_MAX_CURRENT_GAMES = 256
+
+# 进程内牌谱缓存（game_id -> (过期时间, GameRecord)），热门牌谱无需重复读取和解析
+_RECORD_CACHE_SIZE = 512
+_RECORD_CACHE_TTL = 60
+_record_cache: "OrderedDict[str, Tuple[float, GameRecord]]" = OrderedDict()
+
+def invalidate_cached_record(game_id: str):
+    """使缓存中的牌谱失效"""
+    _record_cache.pop(game_id, None)
+
+def _dumps(value: Any):
+    """序列化写入Redis的JSON值（orjson直接输出UTF-8字节）"""
+    if orjson is not None:
+        return orjson.dumps(value)
+    return json.dumps(value, ensure_ascii=False)
+
+def _loads(data):
+    """解析从Redis读出的JSON值"""
+    if orjson is not None:
+        return orjson.loads(data)
+    return json.loads(data)
+
+def _dumps_indented(value: Any) -> bytes:
+    """缩进格式的JSON，与 json.dumps(ensure_ascii=False, indent=2) 输出一致"""
+    if orjson is not None:
+        return orjson.dumps(value, option=orjson.OPT_INDENT_2)
+    return json.dumps(value, ensure_ascii=False, indent=2).encode('utf-8')
+
+# 流式导出时每次写入压缩流的数据块大小
+_EXPORT_CHUNK_SIZE = 64 * 1024
+
+# ZIP导出的DEFLATE压缩级别
+_ZIP_COMPRESSLEVEL = 1
+
+class _ZipChunkBuffer:
+    """ZipFile的不可seek输出目标，积累已压缩的字节供生成器逐块取出"""
+    
+    def __init__(self):
+        self._chunks: List[bytes] = []
+    
+    def write(self, data: bytes) -> int:
+        self._chunks.append(bytes(data))
+        return len(data)
+    
+    def flush(self):
+        pass
+    
+    def drain(self) -> bytes:
+        data = b"".join(self._chunks)
+        self._chunks.clear()
+        return data
+
+def _iter_export_json(export_data: Dict) -> Iterator[bytes]:
+    """分块编码导出JSON，与 json.dumps(ensure_ascii=False, indent=2) 输出一致"""
+    if orjson is not None:
+        yield from _iter_export_json_orjson(export_data)
+        return
+    
+    encoder = json.JSONEncoder(ensure_ascii=False, indent=2)
+    pending = []
+    pending_size = 0
+    for piece in encoder.iterencode(export_data):
+        pending.append(piece)
+        pending_size += len(piece)
+        if pending_size >= _EXPORT_CHUNK_SIZE:
+            yield "".join(pending).encode('utf-8')
+            pending.clear()
+            pending_size = 0
+    if pending:
+        yield "".join(pending).encode('utf-8')
+
+def _iter_export_json_orjson(export_data: Dict) -> Iterator[bytes]:
+    """用orjson逐行编码顶层列表（玩家、操作），内存占用与操作数无关
+
+    orjson的OPT_INDENT_2输出与标准库逐字节相同，嵌套部分按所在层级补齐缩进
+    """
+    pending = [b"{"]
+    pending_size = 1
+    for index, (key, value) in enumerate(export_data.items()):
+        pending.append(b"\n  " if index == 0 else b",\n  ")
+        pending.append(orjson.dumps(key) + b": ")
+        if isinstance(value, list) and value:
+            pending.append(b"[")
+            for row_index, row in enumerate(value):
+                row_data = orjson.dumps(row, option=orjson.OPT_INDENT_2).replace(b"\n", b"\n    ")
+                pending.append(b"\n    " if row_index == 0 else b",\n    ")
+                pending.append(row_data)
+                pending_size += len(row_data)
+                if pending_size >= _EXPORT_CHUNK_SIZE:
+                    yield b"".join(pending)
+                    pending.clear()
+                    pending_size = 0
+            pending.append(b"\n  ]")
+        else:
+            pending.append(orjson.dumps(value, option=orjson.OPT_INDENT_2).replace(b"\n", b"\n  "))
+    pending.append(b"\n}" if export_data else b"}")
+    yield b"".join(pending)
+
+def queue_game_summary(pipe, game_record: GameRecord, expire: Optional[int] = None):
+    """将游戏摘要哈希和时间索引写入管道，列表接口无需再解析完整牌谱"""
+    summary_key = f"game_summary:{game_record.game_id}"
+    summary = game_record.to_summary()
+    pipe.hset(summary_key, mapping={
+        field: _dumps(value) for field, value in summary.items()
+    })
+    if expire:
+        pipe.expire(summary_key, expire)
+    score = game_record.start_time.timestamp()
+    pipe.zadd(GAMES_BY_TIME_KEY, {game_record.game_id: score})
+    for player in game_record.players:
+        player_key = player_games_key(player.player_name)
+        pipe.zadd(player_key, {game_record.game_id: score})
+        if expire:
+            pipe.expire(player_key, expire)
+
+def build_game_statistics(game_record: GameRecordStatsDoc) -> Dict[str, Any]:
+    """根据游戏记录计算统计信息"""
+    statistics = {
+        "basic_info": {
+            "game_id": game_record["game_id"],
+            "duration": game_record["duration"],
+            "total_actions": game_record["total_actions"],
+            "winner_count": game_record["winner_count"]
+        },
+        "player_stats": [
+            {
+                "player_name": p.player_name,
+                "position": p.position,
+                "final_score": p.final_score,
+                "is_winner": p.is_winner,
+                "actions": {
+                    "draw": p.draw_count,
+                    "discard": p.discard_count, 
+                    "peng": p.peng_count,
+                    "gang": p.gang_count
+                }
+            }
+            for p in game_record["players"]
+        ],
+        "action_distribution": {},
+        "timeline": []
+    }
+    
+    # 单次遍历同时统计操作分布和构建关键操作时间线，按整数编码计数
+    action_counts = [0] * len(ACTION_NAMES)
+    timeline = []
+    for action in game_record["actions"]:
+        action_type = action["action_type"]
+        code = ACTION_CODES[action_type]
+        action_counts[code] += 1
+        if code in KEY_ACTION_CODES:
+            player_id = action["player_id"]
+            timeline.append({
+                "sequence": action["sequence"],
+                "timestamp": action["timestamp"],
+                "player_id": player_id,
+                "action_type": action_type,
+                "description": f"玩家{player_id+1} {action_type}"
+            })
+    
+    statistics["action_distribution"] = {
+        name: count for name, count in zip(ACTION_NAMES, action_counts) if count
+    }
+    statistics["timeline"] = timeline
+    return statistics
+
+def queue_game_statistics(pipe, game_record: GameRecord, expire: Optional[int] = None):
+    """将已结束游戏的统计结果写入管道，统计接口直接读取"""
+    doc = _STATS_DOC_ADAPTER.validate_python(game_record.model_dump(mode="json"))
+    pipe.set(
+        f"game_stats:{game_record.game_id}",
+        _dumps(build_game_statistics(doc)),
+        ex=expire
+    )
+
+# 牌谱在Redis中的保存时间
+_RECORD_EXPIRE = 7*24*3600  # 7天过期
+
+# 进行中游戏已追加到操作列表的操作数（game_id -> 数量），没有记录时整表重写
+_persisted_actions: Dict[str, int] = {}
+
+def game_actions_key(game_id: str) -> str:
+    """进行中游戏的操作列表，每项为一条操作的JSON"""
+    return f"game_actions:{game_id}"
+
+def queue_game_record(pipe, game_record: GameRecord, expire: Optional[int] = _RECORD_EXPIRE):
+    """将牌谱、摘要索引以及（已结束时的）统计结果写入管道
+    
+    进行中的游戏只写不含操作的记录本体，新操作追加到操作列表，写入量与已有操作数无关；
+    游戏结束时写入合并后的完整牌谱并删除操作列表
+    """
+    game_id = game_record.game_id
+    invalidate_cached_record(game_id)
+    actions_key = game_actions_key(game_id)
+    if game_record.end_time:
+        pipe.set(f"game_record:{game_id}", game_record.model_dump_json(indent=None), ex=expire)
+        pipe.unlink(actions_key)
+        _persisted_actions.pop(game_id, None)
+    else:
+        pipe.set(f"game_record:{game_id}", game_record.model_dump_json(indent=None, exclude={"actions"}), ex=expire)
+        persisted = _persisted_actions.get(game_id)
+        if persisted is None:
+            pipe.unlink(actions_key)
+            persisted = 0
+        new_actions = game_record.actions[persisted:]
+        if new_actions:
+            pipe.rpush(actions_key, *(action.model_dump_json() for action in new_actions))
+            if expire:
+                pipe.expire(actions_key, expire)
+        _persisted_actions[game_id] = len(game_record.actions)
+    queue_game_summary(pipe, game_record, expire)
+    if game_record.end_time:
+        # 游戏结束后记录不再变化，预先计算统计信息
+        queue_game_statistics(pipe, game_record, expire)
+
+def discard_persisted_actions(game_records: List[GameRecord]):
+    """写入失败时丢弃操作计数，下次保存重写整个操作列表"""
+    for game_record in game_records:
+        _persisted_actions.pop(game_record.game_id, None)
+
+def merge_record_json(record_data, action_items: List[bytes]) -> bytes:
+    """把操作列表拼回不含操作的记录JSON，得到完整牌谱JSON"""
+    if isinstance(record_data, str):
+        record_data = record_data.encode('utf-8')
+    actions = b",".join(
+        item.encode('utf-8') if isinstance(item, str) else item for item in action_items
+    )
+    return b'{"actions":[' + actions + b"]," + record_data.lstrip()[1:]
+
+# 记录操作后延迟写入的时间窗口（秒），窗口内同一游戏的多次操作合并为一次写入
+_SAVE_DEBOUNCE_SECONDS = 0.2
+# 等待写入Redis的游戏记录（game_id -> GameRecord）
+_pending_saves: Dict[str, GameRecord] = {}
+_flush_handle: Optional[asyncio.TimerHandle] = None
+
+# Redis写入在单个后台线程中按提交顺序执行，记录操作的协程不等待网络往返
+_RECORD_WRITER = ThreadPoolExecutor(max_workers=1, thread_name_prefix="replay-record-writer")
+
+def _execute_record_write(pipe) -> bool:
+    """在后台线程中执行写入管道，返回是否成功"""
+    try:
+        pipe.execute()
+        return True
+    except Exception as e:
+        logger.error(f"保存游戏记录失败: {e}")
+        return False
+
+def submit_game_records(redis_service: RedisService, records: List[GameRecord]):
+    """在当前线程把记录编码进管道（相当于拍快照），交给后台线程写入"""
+    pipe = redis_service.pipeline()
+    if pipe is None:
+        return
+    try:
+        for game_record in records:
+            queue_game_record(pipe, game_record)
+    except Exception as e:
+        discard_persisted_actions(records)
+        logger.error(f"保存游戏记录失败: {e}")
+        return
+    future = _RECORD_WRITER.submit(_execute_record_write, pipe)
+    try:
+        loop = asyncio.get_running_loop()
+    except RuntimeError:
+        loop = None
+    
+    def on_done(done: "Future[bool]"):
+        if done.result():
+            return
+        # 操作计数只在提交写入的线程上修改，写入失败时切回该线程丢弃
+        if loop is None:
+            discard_persisted_actions(records)
+            return
+        try:
+            loop.call_soon_threadsafe(discard_persisted_actions, records)
+        except RuntimeError:  # 事件循环已关闭
+            discard_persisted_actions(records)
+    
+    future.add_done_callback(on_done)
+
+def _submit_pending_saves(redis_service: RedisService):
+    """把所有等待写入的游戏记录通过一条管道提交给后台线程"""
+    global _flush_handle
+    if _flush_handle is not None:
+        _flush_handle.cancel()
+        _flush_handle = None
+    if not _pending_saves:
+        return
+    
+    records = list(_pending_saves.values())
+    _pending_saves.clear()
+    submit_game_records(redis_service, records)
+
+def _writer_barrier():
+    """空任务，排在已提交的写入之后，完成即表示之前的写入都已执行"""
+
+async def flush_pending_saves(redis_service: RedisService):
+    """写入所有等待中的游戏记录，并等待后台线程中已提交的写入完成（不阻塞事件循环）"""
+    _submit_pending_saves(redis_service)
+    await asyncio.wrap_future(_RECORD_WRITER.submit(_writer_barrier))
+
+def flush_pending_saves_sync(redis_service: RedisService):
+    """flush_pending_saves 的同步版本，阻塞当前线程直到写入完成，用于关闭应用时"""
+    _submit_pending_saves(redis_service)
+    _RECORD_WRITER.submit(_writer_barrier).result()
 
 class ReplayService:
     """牌谱服务类"""
     
     def __init__(self, redis_service: RedisService):
         self.redis = redis_service
-        self.current_games: Dict[str, GameRecord] = {}
+        # 进行中的游戏，按最近操作排序；结束后转入进程内牌谱缓存
+        self.current_games: "OrderedDict[str, GameRecord]" = OrderedDict()
+        # 每局各玩家最近一次胡牌操作的序号（game_id -> {player_id: sequence}）
+        self._hu_sequences: Dict[str, Dict[int, int]] = {}
     
     async def start_game_recording(
         self, 
@@ -46,6 +418,7 @@ class ReplayService:
         
         # 保存到内存和Redis
         self.current_games[game_id] = game_record
+        self._evict_idle_games()
         await self._save_game_record(game_record)
         
         return game_record
@@ -63,11 +436,55 @@ class ReplayService:
         game_state_snapshot: Optional[Dict] = None
     ) -> GameAction:
         """记录游戏操作"""
-        if game_id not in self.current_games:
+        game_record = await self._get_current_game(game_id)
+        if game_record is None:
             raise ValueError(f"游戏 {game_id} 不存在或未开始记录")
         
-        game_record = self.current_games[game_id]
+        action = self._append_action(
+            game_record,
+            player_id=player_id,
+            action_type=action_type,
+            card=card,
+            target_player=target_player,
+            gang_type=gang_type,
+            missing_suit=missing_suit,
+            score_change=score_change,
+            game_state_snapshot=game_state_snapshot
+        )
+        
+        # 延迟保存到Redis，连续操作合并为一次写入
+        self._schedule_save(game_record)
         
+        return action
+    
+    async def record_actions_batch(self, game_id: str, actions: List[Dict[str, Any]]) -> List[GameAction]:
+        """批量记录游戏操作，全部追加后只写一次Redis
+        
+        actions中每一项为record_action除game_id外的关键字参数
+        """
+        game_record = await self._get_current_game(game_id)
+        if game_record is None:
+            raise ValueError(f"游戏 {game_id} 不存在或未开始记录")
+        
+        recorded = [self._append_action(game_record, **action) for action in actions]
+        
+        self._schedule_save(game_record)
+        
+        return recorded
+    
+    def _append_action(
+        self,
+        game_record: GameRecord,
+        player_id: int,
+        action_type: ActionType,
+        card: Optional[MahjongCard] = None,
+        target_player: Optional[int] = None,
+        gang_type: Optional[GangType] = None,
+        missing_suit: Optional[str] = None,
+        score_change: int = 0,
+        game_state_snapshot: Optional[Dict] = None
+    ) -> GameAction:
+        """把操作追加到内存中的游戏记录并更新统计，不写Redis"""
         # 创建操作记录
         action = GameAction(
             sequence=len(game_record.actions) + 1,
@@ -88,14 +505,15 @@ class ReplayService:
         # 更新玩家统计
         player_record = game_record.players[player_id]
         self._update_player_statistics(player_record, action)
+        if action_type == ActionType.MISSING_SUIT and missing_suit:
+            player_record.missing_suit = missing_suit
+        elif action_type == ActionType.HU:
+            self._hu_sequences.setdefault(game_record.game_id, {})[player_id] = action.sequence
         
         # 保存关键状态快照
         if game_state_snapshot and self._is_key_moment(action):
             game_record.snapshots[action.sequence] = game_state_snapshot
         
-        # 保存到Redis
-        await self._save_game_record(game_record)
-        
         return action
     
     async def record_initial_hand(
@@ -105,14 +523,14 @@ class ReplayService:
         initial_cards: List[MahjongCard]
     ):
         """记录玩家起手牌"""
-        if game_id not in self.current_games:
+        game_record = await self._get_current_game(game_id)
+        if game_record is None:
             raise ValueError(f"游戏 {game_id} 不存在")
         
-        game_record = self.current_games[game_id]
         player_record = game_record.players[player_id]
         player_record.initial_hand = initial_cards
         
-        await self._save_game_record(game_record)
+        self._schedule_save(game_record)
     
     async def record_missing_suit(
         self, 
@@ -121,10 +539,10 @@ class ReplayService:
         missing_suit: str
     ):
         """记录玩家定缺"""
-        if game_id not in self.current_games:
+        game_record = await self._get_current_game(game_id)
+        if game_record is None:
             raise ValueError(f"游戏 {game_id} 不存在")
         
-        game_record = self.current_games[game_id]
         player_record = game_record.players[player_id]
         player_record.missing_suit = missing_suit
         
@@ -144,32 +562,32 @@ class ReplayService:
         hu_types: Optional[List[str]] = None
     ):
         """记录游戏结束"""
-        if game_id not in self.current_games:
+        game_record = await self._get_current_game(game_id)
+        if game_record is None:
             raise ValueError(f"游戏 {game_id} 不存在")
         
-        game_record = self.current_games[game_id]
         game_record.end_time = datetime.now()
         game_record.duration = int((game_record.end_time - game_record.start_time).total_seconds())
         game_record.winner_count = len(winners)
         
         # 更新玩家最终结果
+        hu_sequences = self._hu_sequences.pop(game_id, {})
         for i, player_record in enumerate(game_record.players):
             player_record.final_score = final_scores[i]
             player_record.is_winner = i in winners
             
             if player_record.is_winner and hu_types:
                 player_record.hu_type = hu_types[winners.index(i)]
-                # 找到胡牌操作的序号
-                for action in reversed(game_record.actions):
-                    if action.player_id == i and action.action_type == ActionType.HU:
-                        player_record.hu_sequence = action.sequence
-                        break
+                # 胡牌操作的序号在记录操作时已登记
+                if i in hu_sequences:
+                    player_record.hu_sequence = hu_sequences[i]
         
         # 最终保存
         await self._save_game_record(game_record)
         
-        # 从内存中移除(可选)
-        # del self.current_games[game_id]
+        # 已结束的牌谱不再变化，移出进行中列表，交给有容量上限的牌谱缓存
+        self.current_games.pop(game_id, None)
+        self._cache_record(game_record)
     
     async def get_game_replay(self, game_id: str) -> Optional[GameReplay]:
         """获取游戏牌谱"""
@@ -177,10 +595,13 @@ class ReplayService:
         if game_id in self.current_games:
             game_record = self.current_games[game_id]
         else:
-            # 从Redis加载
-            game_record = await self._load_game_record(game_id)
+            # 再查进程内缓存，最后从Redis加载
+            game_record = self._get_cached_record(game_id)
             if not game_record:
-                return None
+                game_record = await self._load_game_record(game_id)
+                if not game_record:
+                    return None
+                self._cache_record(game_record)
         
         replay_metadata = {
             "generated_at": datetime.now().isoformat(),
@@ -193,14 +614,59 @@ class ReplayService:
             replay_metadata=replay_metadata
         )
     
+    async def get_statistics_doc(self, game_id: str) -> Optional[GameRecordStatsDoc]:
+        """读取统计所需的游戏记录字段，不构建完整的GameRecord"""
+        await flush_pending_saves(self.redis)
+        data = self._get_record_json(game_id)
+        if not data:
+            return None
+        try:
+            return _STATS_DOC_ADAPTER.validate_json(data)
+        except:
+            return None
+    
+    async def get_game_statistics(self, game_id: str) -> Optional[Dict[str, Any]]:
+        """获取游戏统计信息，已结束的游戏直接读取预计算结果"""
+        cached = self.redis.get(f"game_stats:{game_id}")
+        if cached:
+            try:
+                return _loads(cached)
+            except json.JSONDecodeError:
+                pass
+        
+        game_record = await self.get_statistics_doc(game_id)
+        if not game_record:
+            return None
+        return build_game_statistics(game_record)
+    
+    async def get_replay_etag(self, game_id: str) -> Optional[str]:
+        """已结束牌谱的ETag，由摘要中的结束时间和操作数生成；进行中或不存在时返回None"""
+        summary = self.redis.hgetall(f"game_summary:{game_id}")
+        if not summary or not summary.get("end_time"):
+            return None
+        fingerprint = f"{game_id}:{summary['end_time']}:{summary.get('total_actions')}"
+        return f'"{hashlib.blake2b(fingerprint.encode("utf-8"), digest_size=16).hexdigest()}"'
+    
+    async def exists(self, game_id: str) -> bool:
+        """检查牌谱是否存在，不加载牌谱内容"""
+        if game_id in self.current_games or game_id in _record_cache:
+            return True
+        return self.redis.exists(f"game_record:{game_id}")
+    
     async def export_replay_json(self, game_id: str) -> str:
         """导出JSON格式牌谱"""
         replay = await self.get_game_replay(game_id)
         if not replay:
             raise ValueError(f"牌谱 {game_id} 不存在")
         
-        export_data = replay.to_export_format()
-        return json.dumps(export_data, ensure_ascii=False, indent=2)
+        return b"".join(_iter_export_json(replay.to_export_format())).decode('utf-8')
+    
+    async def stream_replay_json(self, game_id: str) -> Iterator[bytes]:
+        """获取JSON格式牌谱的分块迭代器，首块编码完成即可发送"""
+        replay = await self.get_game_replay(game_id)
+        if not replay:
+            raise ValueError(f"牌谱 {game_id} 不存在")
+        return _iter_export_json(replay.to_export_format())
     
     async def export_replay_file(self, game_id: str, format: str = "json") -> bytes:
         """导出牌谱文件"""
@@ -210,91 +676,334 @@ class ReplayService:
         
         if format.lower() == "json":
             # JSON格式导出
-            json_data = await self.export_replay_json(game_id)
-            return json_data.encode('utf-8')
+            return b"".join(_iter_export_json(replay.to_export_format()))
         
         elif format.lower() == "zip":
             # ZIP压缩包格式
-            return await self._export_replay_zip(replay)
+            return b"".join(self.iter_replay_zip(replay))
         
         else:
             raise ValueError(f"不支持的导出格式: {format}")
     
+    async def stream_replay_zip(self, game_id: str) -> Iterator[bytes]:
+        """获取ZIP格式牌谱的分块迭代器，压缩数据边生成边发送"""
+        replay = await self.get_game_replay(game_id)
+        if not replay:
+            raise ValueError(f"牌谱 {game_id} 不存在")
+        return self.iter_replay_zip(replay)
+    
     async def get_player_game_history(
         self, 
         player_name: str, 
         limit: int = 50
     ) -> List[GameRecord]:
         """获取玩家游戏历史"""
-        # 从Redis搜索该玩家的游戏记录
-        player_games = []
+        await flush_pending_saves(self.redis)
         
-        game_keys = self.redis.keys("game_record:*") 
-        for key in game_keys:
-            try:
-                game_data = self.redis.get(key)
-                if game_data:
-                    game_record = GameRecord.model_validate_json(game_data)
-                    # 检查是否包含该玩家
-                    if any(p.player_name == player_name for p in game_record.players):
-                        player_games.append(game_record)
-            except:
-                continue
+        # 玩家索引按开始时间排序，直接取最近limit局，一次MGET取回记录
+        player_key = player_games_key(player_name)
+        game_ids = self.redis.zrevrange(player_key, 0, limit - 1)
+        # 不满limit局时可能还有未建索引的旧牌谱，补建后重新读取
+        if len(game_ids) < limit and await self._ensure_game_index():
+            game_ids = self.redis.zrevrange(player_key, 0, limit - 1)
+        if not game_ids:
+            return []
         
-        # 按时间排序，返回最新的记录
-        player_games.sort(key=lambda x: x.start_time, reverse=True)
-        return player_games[:limit]
+        game_datas = self._get_record_json_many(game_ids)
+        # 牌谱已过期的，顺手清理索引
+        stale_ids = [game_id for game_id, game_data in zip(game_ids, game_datas) if not game_data]
+        if stale_ids:
+            pipe = self.redis.pipeline()
+            if pipe is not None:
+                try:
+                    pipe.zrem(player_key, *stale_ids)
+                    pipe.execute()
+                except Exception as e:
+                    logger.error(f"清理玩家游戏索引失败: {e}")
+        
+        # 几十局完整牌谱的解析放到线程中，不阻塞事件循环
+        return await asyncio.to_thread(_parse_game_records, game_datas)
     
     def _update_player_statistics(self, player_record: PlayerGameRecord, action: GameAction):
         """更新玩家统计数据"""
-        if action.action_type == ActionType.DRAW:
-            player_record.draw_count += 1
-        elif action.action_type == ActionType.DISCARD:
-            player_record.discard_count += 1
-        elif action.action_type == ActionType.PENG:
-            player_record.peng_count += 1
-        elif action.action_type == ActionType.GANG:
-            player_record.gang_count += 1
+        field = PLAYER_STAT_FIELDS.get(action.action_type)
+        if field:
+            setattr(player_record, field, getattr(player_record, field) + 1)
     
     def _is_key_moment(self, action: GameAction) -> bool:
         """判断是否为关键时刻，需要保存状态快照"""
-        key_actions = {ActionType.PENG, ActionType.GANG, ActionType.HU, ActionType.MISSING_SUIT}
-        return action.action_type in key_actions
+        return action.action_type in KEY_ACTIONS
+    
+    def _get_cached_record(self, game_id: str) -> Optional[GameRecord]:
+        """从进程内缓存获取牌谱，过期则移除"""
+        entry = _record_cache.get(game_id)
+        if entry is None:
+            return None
+        expires_at, game_record = entry
+        if expires_at < time.monotonic():
+            del _record_cache[game_id]
+            return None
+        _record_cache.move_to_end(game_id)
+        return game_record
+    
+    async def _get_current_game(self, game_id: str) -> Optional[GameRecord]:
+        """获取进行中的游戏记录并标记为最近使用，已被移出内存的进行中游戏从Redis重新加载"""
+        game_record = self.current_games.get(game_id)
+        if game_record is not None:
+            self.current_games.move_to_end(game_id)
+            return game_record
+        
+        game_record = await self._load_game_record(game_id)
+        if game_record is None or game_record.end_time:
+            return None
+        # 等待加载期间可能已被其他协程重新加载，以内存中的为准
+        if game_id in self.current_games:
+            self.current_games.move_to_end(game_id)
+            return self.current_games[game_id]
+        
+        hu_sequences = {
+            action.player_id: action.sequence
+            for action in game_record.actions
+            if action.action_type == ActionType.HU
+        }
+        if hu_sequences:
+            self._hu_sequences[game_id] = hu_sequences
+        self.current_games[game_id] = game_record
+        self._evict_idle_games()
+        return game_record
+    
+    def _evict_idle_games(self):
+        """进行中的游戏超出上限时，移出最久没有操作的游戏（其记录已写入或等待写入Redis，再次操作时重新加载）"""
+        while len(self.current_games) > _MAX_CURRENT_GAMES:
+            game_id, _ = self.current_games.popitem(last=False)
+            self._hu_sequences.pop(game_id, None)
+            _persisted_actions.pop(game_id, None)
+            logger.info("进行中的游戏过多，暂时移出最久未操作的游戏 %s", game_id)
+    
+    def _cache_record(self, game_record: GameRecord):
+        """写入进程内缓存，超出容量时淘汰最久未用的记录"""
+        _record_cache[game_record.game_id] = (time.monotonic() + _RECORD_CACHE_TTL, game_record)
+        _record_cache.move_to_end(game_record.game_id)
+        while len(_record_cache) > _RECORD_CACHE_SIZE:
+            _record_cache.popitem(last=False)
+    
+    def _schedule_save(self, game_record: GameRecord):
+        """标记游戏记录待保存，在时间窗口结束时统一写入Redis"""
+        global _flush_handle
+        _pending_saves[game_record.game_id] = game_record
+        if _flush_handle is None:
+            _flush_handle = asyncio.get_running_loop().call_later(
+                _SAVE_DEBOUNCE_SECONDS, _submit_pending_saves, self.redis
+            )
     
     async def _save_game_record(self, game_record: GameRecord):
-        """保存游戏记录到Redis"""
-        key = f"game_record:{game_record.game_id}"
-        # 使用model_dump_json替代json方法
-        json_data = game_record.model_dump_json(indent=None)
-        self.redis.set(
-            key, 
-            json_data,
-            expire=7*24*3600  # 7天过期
-        )
+        """立即提交游戏记录的写入，不等待Redis往返"""
+        # 本次写入已包含该游戏尚未落盘的操作
+        _pending_saves.pop(game_record.game_id, None)
+        submit_game_records(self.redis, [game_record])
+    
+    async def list_recent_games(self, limit: int = 20) -> List[Dict[str, Any]]:
+        """获取最近的游戏摘要，按开始时间倒序"""
+        await flush_pending_saves(self.redis)
+        game_ids = self.redis.zrevrange(GAMES_BY_TIME_KEY, 0, limit - 1)
+        summaries = self.redis.hgetall_many([f"game_summary:{game_id}" for game_id in game_ids])
+        
+        recent_games = []
+        stale_ids = []
+        for game_id, summary in zip(game_ids, summaries):
+            if summary:
+                recent_games.append(summary)
+            else:
+                # 摘要已随牌谱过期，顺手清理索引
+                stale_ids.append(game_id)
+        
+        if stale_ids:
+            pipe = self.redis.pipeline()
+            if pipe is not None:
+                try:
+                    pipe.zrem(GAMES_BY_TIME_KEY, *stale_ids)
+                    pipe.execute()
+                except Exception as e:
+                    logger.error(f"清理游戏索引失败: {e}")
+        
+        # 不满一页时可能还有未建索引的旧牌谱，补建后重新读取
+        if len(recent_games) < limit and await self._ensure_game_index():
+            return await self.list_recent_games(limit)
+        
+        return recent_games
+    
+    async def _ensure_game_index(self) -> bool:
+        """为没有摘要或不在索引中的牌谱补建索引（每个进程只成功执行一次），本次执行了补建时返回True"""
+        global _game_index_backfilled
+        if _game_index_backfilled:
+            return False
+        async with _game_index_lock:
+            if _game_index_backfilled:
+                return False
+            indexed = await asyncio.to_thread(self._backfill_game_index)
+            if indexed is None:
+                return False
+            _game_index_backfilled = True
+            if indexed:
+                logger.info(f"为 {indexed} 个旧牌谱补建了摘要")
+            return True
+    
+    def _backfill_game_index(self) -> Optional[int]:
+        """扫描 game_record:* 补建摘要和索引，返回新建摘要的数量，Redis出错时返回None"""
+        client = self.redis.redis_client
+        if client is None:
+            return None
+        
+        indexed = 0
+        try:
+            batch = []
+            for key in client.scan_iter(match="game_record:*", count=500):
+                batch.append(key.decode('utf-8') if isinstance(key, bytes) else key)
+                if len(batch) >= _HISTORY_PAGE_SIZE:
+                    indexed += self._backfill_game_index_batch(client, batch)
+                    batch = []
+            if batch:
+                indexed += self._backfill_game_index_batch(client, batch)
+        except Exception as e:
+            logger.error(f"补建游戏索引失败: {e}")
+            return None
+        return indexed
+    
+    def _backfill_game_index_batch(self, client, record_keys: List[str]) -> int:
+        """为一批牌谱补建索引，返回新建摘要的数量
+
+        缺少摘要的记录解析后写入摘要和索引，摘要与牌谱保持相同的过期时间；
+        已有摘要的记录按摘要重新加入时间索引和玩家索引（玩家索引可能先于不过期的牌谱过期）
+        """
+        game_ids = [key[len("game_record:"):] for key in record_keys]
+        pipe = client.pipeline(transaction=False)
+        for game_id in game_ids:
+            pipe.hgetall(f"game_summary:{game_id}")
+            pipe.ttl(f"game_record:{game_id}")
+        results = pipe.execute()
+        
+        pipe = client.pipeline(transaction=False)
+        missing_ids = []
+        ttls = {}
+        for game_id, summary, ttl in zip(game_ids, results[::2], results[1::2]):
+            if not summary:
+                missing_ids.append(game_id)
+                ttls[game_id] = ttl
+                continue
+            try:
+                players = _loads(summary[b"players"])
+                score = datetime.fromisoformat(_loads(summary[b"start_time"])).timestamp()
+            except Exception:
+                continue
+            pipe.zadd(GAMES_BY_TIME_KEY, {game_id: score})
+            for player_name in players:
+                pipe.zadd(player_games_key(player_name), {game_id: score})
+        
+        indexed = 0
+        for game_record in _parse_game_records(self._get_record_json_many(missing_ids)):
+            ttl = ttls.get(game_record.game_id, -1)
+            queue_game_summary(pipe, game_record, ttl if ttl > 0 else None)
+            indexed += 1
+        pipe.execute()
+        return indexed
+    
+    async def record_share(self, game_id: str):
+        """记录分享信息：首次分享时间、累计分享次数，单次往返完成"""
+        share_key = f"share:{game_id}"
+        pipe = self.redis.pipeline()
+        if pipe is None:
+            return
+        
+        try:
+            pipe.hset(share_key, "game_id", game_id)
+            pipe.hsetnx(share_key, "created_at", datetime.now().isoformat())
+            # 原子自增，并发分享不会互相覆盖计数
+            pipe.hincrby(share_key, "share_count", 1)
+            pipe.expire(share_key, 30*24*3600)  # 30天过期
+            pipe.execute()
+        except Exception as e:
+            logger.error(f"记录分享信息失败: {e}")
+    
+    async def delete_game_record(self, game_id: str):
+        """删除牌谱及其分享记录、摘要索引和统计，单次往返完成"""
+        # 先让尚未完成的写入落盘，避免删除后又被写回
+        await flush_pending_saves(self.redis)
+        invalidate_cached_record(game_id)
+        players = self.redis.hget(f"game_summary:{game_id}", "players") or []
+        pipe = self.redis.pipeline()
+        if pipe is None:
+            return
+        
+        try:
+            for player_name in players:
+                pipe.zrem(player_games_key(player_name), game_id)
+            # UNLINK在后台释放内存，大牌谱不会阻塞Redis主线程
+            pipe.unlink(
+                f"game_record:{game_id}",
+                game_actions_key(game_id),
+                f"share:{game_id}",
+                f"game_summary:{game_id}",
+                f"game_stats:{game_id}"
+            )
+            pipe.zrem(GAMES_BY_TIME_KEY, game_id)
+            pipe.execute()
+        except Exception as e:
+            logger.error(f"删除游戏记录失败: {e}")
+    
+    def _get_record_json(self, game_id: str) -> Optional[bytes]:
+        """读取完整牌谱JSON，进行中的游戏合并操作列表"""
+        return self._get_record_json_many([game_id])[0]
+    
+    def _get_record_json_many(self, game_ids: List[str]) -> List[Optional[bytes]]:
+        """通过管道批量读取完整牌谱JSON，不存在的为None"""
+        if not game_ids:
+            return []
+        pipe = self.redis.pipeline()
+        if pipe is None:
+            return [None] * len(game_ids)
+        
+        try:
+            for game_id in game_ids:
+                pipe.get(f"game_record:{game_id}")
+                pipe.lrange(game_actions_key(game_id), 0, -1)
+            results = pipe.execute()
+        except Exception as e:
+            logger.error(f"读取游戏记录失败: {e}")
+            return [None] * len(game_ids)
+        
+        records = []
+        for record_data, action_items in zip(results[::2], results[1::2]):
+            if record_data and action_items:
+                record_data = merge_record_json(record_data, action_items)
+            records.append(record_data)
+        return records
     
     async def _load_game_record(self, game_id: str) -> Optional[GameRecord]:
         """从Redis加载游戏记录"""
-        key = f"game_record:{game_id}"
-        data = self.redis.get(key)
+        await flush_pending_saves(self.redis)
+        data = self._get_record_json(game_id)
         if data:
             try:
-                # 使用model_validate_json替代parse_raw
-                return GameRecord.model_validate_json(data)
+                return _GAME_RECORD_ADAPTER.validate_json(data)
             except:
                 return None
         return None
     
-    async def _export_replay_zip(self, replay: GameReplay) -> bytes:
-        """导出ZIP格式牌谱"""
-        buffer = io.BytesIO()
+    def iter_replay_zip(self, replay: GameReplay) -> Iterator[bytes]:
+        """逐块生成ZIP格式牌谱，内存占用与牌谱大小无关"""
+        buffer = _ZipChunkBuffer()
         
-        with zipfile.ZipFile(buffer, 'w', zipfile.ZIP_DEFLATED) as zf:
-            # 主要牌谱文件
-            game_data = replay.to_export_format()
-            zf.writestr(
-                f"{replay.game_record.game_id}.json",
-                json.dumps(game_data, ensure_ascii=False, indent=2)
-            )
+        # JSON在最低压缩级别下已有很好的压缩率，CPU开销远低于默认级别
+        with zipfile.ZipFile(buffer, 'w', zipfile.ZIP_DEFLATED, compresslevel=_ZIP_COMPRESSLEVEL) as zf:
+            # 主要牌谱文件，边编码边压缩
+            with zf.open(f"{replay.game_record.game_id}.json", 'w') as entry:
+                for chunk in _iter_export_json(replay.to_export_format()):
+                    entry.write(chunk)
+                    # 压缩器攒满一块才输出，空块不发送
+                    data = buffer.drain()
+                    if data:
+                        yield data
+            yield buffer.drain()
             
             # 添加摘要信息
             summary = {
@@ -307,7 +1016,7 @@ class ReplayService:
             }
             zf.writestr(
                 "summary.json",
-                json.dumps(summary, ensure_ascii=False, indent=2)
+                _dumps_indented(summary)
             )
             
             # 添加说明文件
@@ -329,5 +1038,4 @@ class ReplayService:
 """
             zf.writestr("README.md", readme)
         
-        buffer.seek(0)
-        return buffer.read() 
\ No newline at end of file
+        yield buffer.drain() 
\ No newline at end of file
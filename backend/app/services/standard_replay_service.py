@@ -3,21 +3,50 @@
 支持直接读取和处理新格式文件 model/first_hand/sample_mahjong_game_final.json
 """
 
-import json
 import asyncio
 from pathlib import Path
-from typing import Dict, List, Optional, Any
+from typing import Dict, List, Optional, Any, Tuple, Type, TypeVar
 from datetime import datetime, timedelta
 
+from pydantic import BaseModel
+
 from app.models.standard_replay import (
     StandardReplayData, StandardGameAction, InitialHandData, 
-    TileConverter, StandardActionType
+    TileConverter, StandardActionType, StandardFileInfo
 )
 from app.models.game_record import (
     GameRecord, GameAction, PlayerGameRecord, 
     ActionType, MahjongCard, GangType
 )
 from app.services.redis_service import RedisService
+from app.services.replay_service import PLAYER_STAT_FIELDS, queue_game_record
+
+ModelT = TypeVar("ModelT", bound=BaseModel)
+
+# 标准格式文件解析缓存：(路径, 模型) -> (修改时间, 解析结果)，文件未变化时不再重复读取和解析
+_file_model_cache: Dict[Tuple[str, Type[BaseModel]], Tuple[int, BaseModel]] = {}
+
+def _load_cached_model(file_path: str, model: Type[ModelT]) -> ModelT:
+    """按文件修改时间缓存解析结果，文件变化后重新读取"""
+    mtime = Path(file_path).stat().st_mtime_ns
+    cache_key = (file_path, model)
+    cached = _file_model_cache.get(cache_key)
+    if cached and cached[0] == mtime:
+        return cached[1]
+    
+    parsed = model.model_validate_json(Path(file_path).read_bytes())
+    _file_model_cache[cache_key] = (mtime, parsed)
+    return parsed
+
+def _card_from_dict(card_dict: Dict[str, Any]) -> MahjongCard:
+    """由TileConverter的结果构建MahjongCard，花色和牌值来自合法牌名表，跳过重复校验"""
+    return MahjongCard.model_construct(
+        id=card_dict["id"], suit=card_dict["suit"], value=card_dict["value"]
+    )
+
+def load_standard_file_info(file_path: str) -> StandardFileInfo:
+    """读取标准格式文件概要，按文件修改时间缓存"""
+    return _load_cached_model(file_path, StandardFileInfo)
 
 class StandardReplayService:
     """标准化牌谱服务"""
@@ -29,18 +58,16 @@ class StandardReplayService:
     def load_standard_replay_file(self, file_path: str) -> StandardReplayData:
         """加载标准格式牌谱文件"""
         try:
-            with open(file_path, 'r', encoding='utf-8') as f:
-                data = json.load(f)
-            
-            # 使用Pydantic验证和解析数据
-            standard_replay = StandardReplayData(**data)
-            return standard_replay
+            # 直接由Pydantic解析原始字节，省去中间字典；重复导入同一文件时复用解析结果
+            return _load_cached_model(file_path, StandardReplayData)
             
         except Exception as e:
             raise ValueError(f"加载标准牌谱文件失败: {e}")
     
     def convert_standard_to_backend_format(self, standard_replay: StandardReplayData) -> Dict[str, Any]:
         """将标准格式转换为后台GameRecord格式"""
+        # 标准格式不含时间信息，所有时间字段共用同一个当前时间
+        now = datetime.now()
         
         # 创建玩家记录
         players = []
@@ -54,8 +81,7 @@ class StandardReplayService:
             for tile_str in hand_data.tiles:
                 try:
                     card_dict = self.tile_converter.to_mahjong_card_dict(tile_str, card_id_counter)
-                    card = MahjongCard(**card_dict)
-                    initial_cards.append(card)
+                    initial_cards.append(_card_from_dict(card_dict))
                     card_id_counter += 1
                 except Exception as e:
                     print(f"⚠️ 转换牌失败: {tile_str}, 错误: {e}")
@@ -78,6 +104,8 @@ class StandardReplayService:
         
         # 转换游戏动作
         actions = []
+        # 动作中的牌使用默认牌ID，MahjongCard不可变，同一牌名共用一个实例
+        action_cards: Dict[str, MahjongCard] = {}
         for action_data in standard_replay.actions:
             try:
                 # 转换动作类型
@@ -86,13 +114,15 @@ class StandardReplayService:
                 # 转换牌信息
                 card = None
                 if action_data.tile:
-                    card_dict = self.tile_converter.to_mahjong_card_dict(action_data.tile)
-                    card = MahjongCard(**card_dict)
+                    card = action_cards.get(action_data.tile)
+                    if card is None:
+                        card_dict = self.tile_converter.to_mahjong_card_dict(action_data.tile)
+                        card = action_cards[action_data.tile] = _card_from_dict(card_dict)
                 
                 # 创建动作记录
                 game_action = GameAction(
                     sequence=action_data.sequence,
-                    timestamp=datetime.now(),  # 使用当前时间，实际应该从数据中获取
+                    timestamp=now,  # 使用当前时间，实际应该从数据中获取
                     player_id=action_data.player_id,
                     action_type=action_type,
                     card=card,
@@ -103,15 +133,10 @@ class StandardReplayService:
                 actions.append(game_action)
                 
                 # 更新玩家统计
-                player = players[action_data.player_id]
-                if action_type == ActionType.DRAW:
-                    player.draw_count += 1
-                elif action_type == ActionType.DISCARD:
-                    player.discard_count += 1
-                elif action_type == ActionType.PENG:
-                    player.peng_count += 1
-                elif action_type == ActionType.GANG:
-                    player.gang_count += 1
+                field = PLAYER_STAT_FIELDS.get(action_type)
+                if field:
+                    player = players[action_data.player_id]
+                    setattr(player, field, getattr(player, field) + 1)
                     
             except Exception as e:
                 print(f"⚠️ 转换动作失败: {action_data}, 错误: {e}")
@@ -119,8 +144,8 @@ class StandardReplayService:
         # 创建游戏记录
         game_record = GameRecord(
             game_id=standard_replay.game_info.game_id,
-            start_time=datetime.now() - timedelta(minutes=30),
-            end_time=datetime.now(),
+            start_time=now - timedelta(minutes=30),
+            end_time=now,
             duration=30 * 60,  # 30分钟
             players=players,
             actions=actions,
@@ -141,7 +166,7 @@ class StandardReplayService:
             "game_record": game_record,
             "replay_metadata": {
                 "format": "standard",
-                "generated_at": datetime.now().isoformat(),
+                "generated_at": now.isoformat(),
                 "source_file": standard_replay.game_info.original_file
             }
         }
@@ -187,8 +212,8 @@ class StandardReplayService:
         """
         print(f"📥 导入标准格式牌谱: {file_path}")
         
-        # 加载标准格式数据
-        standard_replay = self.load_standard_replay_file(file_path)
+        # 加载标准格式数据（文件读取放到线程中，不阻塞事件循环）
+        standard_replay = await asyncio.to_thread(self.load_standard_replay_file, file_path)
         
         # 确定游戏ID
         game_id = target_game_id or standard_replay.game_info.game_id
@@ -201,17 +226,11 @@ class StandardReplayService:
         # 更新游戏ID
         game_record.game_id = game_id
         
-        # 存储到Redis
-        game_record_key = f"game_record:{game_id}"
-        
-        # 将GameRecord转换为可序列化的字典
-        game_record_dict = game_record.model_dump()
-        
-        # 处理datetime字段序列化
-        serialized_dict = self._serialize_datetime_fields(game_record_dict)
-        
-        # 存储到Redis
-        self.redis.set(game_record_key, json.dumps(serialized_dict, ensure_ascii=False))
+        # 牌谱由model_dump_json直接编码，与摘要索引、统计信息一起单次往返写入Redis；导入的牌谱不过期
+        pipe = self.redis.pipeline()
+        if pipe is not None:
+            queue_game_record(pipe, game_record, expire=None)
+            pipe.execute()
         
         print(f"✅ 标准格式牌谱已导入系统: {game_id}")
         print(f"📊 玩家数: {len(game_record.players)}")
@@ -219,17 +238,6 @@ class StandardReplayService:
         
         return game_id
     
-    def _serialize_datetime_fields(self, data: Any) -> Any:
-        """递归处理datetime字段，转换为ISO字符串"""
-        if isinstance(data, datetime):
-            return data.isoformat()
-        elif isinstance(data, dict):
-            return {k: self._serialize_datetime_fields(v) for k, v in data.items()}
-        elif isinstance(data, list):
-            return [self._serialize_datetime_fields(item) for item in data]
-        else:
-            return data
-    
     async def get_available_standard_replays(self) -> List[Dict[str, Any]]:
         """获取可用的标准格式牌谱列表"""
         
@@ -246,22 +254,20 @@ class StandardReplayService:
         
         for file_info in standard_files:
             file_path = file_info["file_path"]
-            if Path(file_path).exists():
+            if await asyncio.to_thread(Path(file_path).exists):
                 try:
                     # 读取基本信息
-                    with open(file_path, 'r', encoding='utf-8') as f:
-                        data = json.load(f)
-                    
-                    game_info = data.get("game_info", {})
+                    data = await asyncio.to_thread(load_standard_file_info, file_path)
+                    game_info = data.game_info
                     
                     available_replays.append({
                         "game_id": game_info.get("game_id", "unknown"),
                         "name": file_info["name"],
                         "description": file_info["description"],
                         "file_path": file_path,
-                        "mjtype": data.get("mjtype", "xuezhan_daodi"),
-                        "player_count": len(data.get("initial_hands", {})),
-                        "action_count": len(data.get("actions", [])),
+                        "mjtype": data.mjtype or "xuezhan_daodi",
+                        "player_count": len(data.initial_hands),
+                        "action_count": len(data.actions),
                         "source": game_info.get("source", "unknown"),
                         "version": game_info.get("version", "unknown")
                     })
@@ -1,46 +1,101 @@
-from typing import Dict, List, Optional
+from typing import Dict, List, Optional, Set, Tuple
 from fastapi import WebSocket, WebSocketDisconnect
 import json
 import asyncio
 import logging
+import time
+from dataclasses import dataclass
 from datetime import datetime
 
+try:
+    import orjson
+except ImportError:  # orjson为可选依赖，缺失时退回标准库json
+    orjson = None
+
 logger = logging.getLogger(__name__)
 
+# 时间戳缓存的有效期（秒），同一时刻的多条消息共用一个ISO时间字符串
+_TIMESTAMP_RESOLUTION = 0.001
+
+# 每个连接待发送消息的上限，超过说明客户端已无法跟上，直接断开
+_SEND_QUEUE_SIZE = 1024
+
+
+def dumps_message(message: dict) -> str:
+    """序列化WebSocket消息"""
+    if orjson is not None:
+        return orjson.dumps(message, option=orjson.OPT_NON_STR_KEYS).decode()
+    return json.dumps(message, ensure_ascii=False)
+
+
+@dataclass(slots=True, eq=False)
+class ConnInfo:
+    """单个连接的全部状态，按对象身份存入房间集合"""
+    id: str
+    room_id: str
+    ws: WebSocket
+    out_queue: asyncio.Queue
+    connected_at: str
+    last_activity: str
+    writer: Optional[asyncio.Task] = None
+    
+    def to_dict(self) -> dict:
+        """对外暴露的连接信息"""
+        return {
+            "id": self.id,
+            "room_id": self.room_id,
+            "connected_at": self.connected_at,
+            "last_activity": self.last_activity
+        }
+
 
 class ConnectionManager:
     """WebSocket连接管理器"""
     
     def __init__(self):
-        # 存储所有活跃连接 {connection_id: websocket}
-        self.active_connections: Dict[str, WebSocket] = {}
-        # 连接到房间的映射 {connection_id: room_id}
-        self.connection_rooms: Dict[str, str] = {}
-        # 房间到连接的映射 {room_id: [connection_ids]}
-        self.room_connections: Dict[str, List[str]] = {}
-        # 连接信息 {connection_id: connection_info}
-        self.connection_info: Dict[str, dict] = {}
-    
-    async def connect(self, websocket: WebSocket, connection_id: str, room_id: str = "default"):
-        """新连接接入"""
+        # 所有活跃连接 {connection_id: ConnInfo}
+        self.connections: Dict[str, ConnInfo] = {}
+        # 房间到连接的映射 {room_id: {ConnInfo}}
+        self.room_connections: Dict[str, Set[ConnInfo]] = {}
+        self._timestamp = ""
+        self._timestamp_at = float("-inf")
+    
+    def now_iso(self) -> str:
+        """当前时间的ISO字符串，_TIMESTAMP_RESOLUTION内重复调用直接返回缓存值"""
+        now = time.monotonic()
+        if now - self._timestamp_at >= _TIMESTAMP_RESOLUTION:
+            self._timestamp = datetime.now().isoformat()
+            self._timestamp_at = now
+        return self._timestamp
+    
+    async def connect(self, websocket: WebSocket, connection_id: str, room_id: str = "default",
+                      welcome_message: Optional[dict] = None):
+        """新连接接入；welcome_message在加入房间前入队，保证先于任何广播送达"""
         await websocket.accept()
         
-        # 存储连接
-        self.active_connections[connection_id] = websocket
-        self.connection_rooms[connection_id] = room_id
+        # 同一ID重复接入时先清理旧连接，避免旧对象残留在房间集合中
+        if connection_id in self.connections:
+            self.disconnect(connection_id)
+        
+        # 存储连接，每个连接一个发送队列和一个写协程，保证同一socket只有一个写者
+        now = self.now_iso()
+        info = ConnInfo(
+            id=connection_id,
+            room_id=room_id,
+            ws=websocket,
+            out_queue=asyncio.Queue(maxsize=_SEND_QUEUE_SIZE),
+            connected_at=now,
+            last_activity=now
+        )
+        info.writer = asyncio.create_task(self._writer(info))
+        self.connections[connection_id] = info
+        if welcome_message is not None:
+            self._enqueue(info, dumps_message(welcome_message))
         
         # 加入房间
         if room_id not in self.room_connections:
-            self.room_connections[room_id] = []
-        self.room_connections[room_id].append(connection_id)
-        
-        # 存储连接信息
-        self.connection_info[connection_id] = {
-            "id": connection_id,
-            "room_id": room_id,
-            "connected_at": datetime.now().isoformat(),
-            "last_activity": datetime.now().isoformat()
-        }
+            self.room_connections[room_id] = set()
+        self.room_connections[room_id].add(info)
         
         logger.info(f"WebSocket连接建立: {connection_id} (房间: {room_id})")
         
@@ -53,42 +108,42 @@ class ConnectionManager:
                 "room_id": room_id,
                 "total_connections": len(self.room_connections[room_id])
             },
-            "timestamp": datetime.now().isoformat()
+            "timestamp": self.now_iso()
         }, exclude=[connection_id])
     
     def disconnect(self, connection_id: str):
         """连接断开"""
-        room_id = self.connection_rooms.get(connection_id)
-        
-        # 从连接池中移除
-        if connection_id in self.active_connections:
-            del self.active_connections[connection_id]
+        info = self.connections.pop(connection_id, None)
+        if info is None:
+            return
+        room_id = info.room_id
         
         # 从房间中移除
-        if connection_id in self.connection_rooms:
-            del self.connection_rooms[connection_id]
-        
-        if room_id and room_id in self.room_connections:
-            if connection_id in self.room_connections[room_id]:
-                self.room_connections[room_id].remove(connection_id)
+        room = self.room_connections.get(room_id)
+        if room is not None:
+            room.discard(info)
             
             # 如果房间为空，删除房间
-            if not self.room_connections[room_id]:
+            if not room:
                 del self.room_connections[room_id]
         
-        # 删除连接信息
-        if connection_id in self.connection_info:
-            del self.connection_info[connection_id]
+        # 停止写协程，未发送的消息随队列丢弃
+        if info.writer is not None and info.writer is not asyncio.current_task():
+            info.writer.cancel()
         
         logger.info(f"WebSocket连接断开: {connection_id} (房间: {room_id})")
         
         # 向房间其他成员广播成员离开（使用异步任务）
-        if room_id:
-            asyncio.create_task(self.notify_client_disconnected(room_id, connection_id))
+        asyncio.create_task(self.notify_client_disconnected(room_id, connection_id))
+    
+    def _drop(self, info: ConnInfo):
+        """断开指定连接对象；同一ID已被新连接替换时不做处理"""
+        if self.connections.get(info.id) is info:
+            self.disconnect(info.id)
     
     async def notify_client_disconnected(self, room_id: str, disconnected_id: str):
         """通知客户端断开连接"""
-        remaining_count = len(self.room_connections.get(room_id, []))
+        remaining_count = len(self.room_connections.get(room_id, ()))
         await self.broadcast_to_room(room_id, {
             "type": "broadcast",
             "event": "client_disconnected", 
@@ -97,77 +152,95 @@ class ConnectionManager:
                 "room_id": room_id,
                 "total_connections": remaining_count
             },
-            "timestamp": datetime.now().isoformat()
+            "timestamp": self.now_iso()
         })
     
-    async def send_personal_message(self, message: dict, connection_id: str):
-        """发送个人消息"""
-        if connection_id in self.active_connections:
+    async def _writer(self, info: ConnInfo):
+        """按顺序发送队列中的消息，发送失败时断开连接"""
+        while True:
+            text = await info.out_queue.get()
             try:
-                websocket = self.active_connections[connection_id]
-                await websocket.send_text(json.dumps(message, ensure_ascii=False))
-                
-                # 更新最后活动时间
-                if connection_id in self.connection_info:
-                    self.connection_info[connection_id]["last_activity"] = datetime.now().isoformat()
-                
-                return True
+                await info.ws.send_text(text)
             except Exception as e:
-                logger.error(f"发送个人消息失败 {connection_id}: {e}")
+                logger.error(f"发送消息失败 {info.id}: {e}")
                 # 连接已断开，清理连接
-                self.disconnect(connection_id)
-                return False
-        return False
+                self._drop(info)
+                return
+    
+    def _enqueue(self, info: ConnInfo, text: str) -> bool:
+        """把已序列化的消息放入连接的发送队列，不等待网络写入"""
+        try:
+            info.out_queue.put_nowait(text)
+            return True
+        except asyncio.QueueFull:
+            logger.warning(f"连接 {info.id} 发送队列已满，断开连接")
+            self._drop(info)
+            return False
+    
+    async def send_personal_message(self, message: dict, connection_id: str):
+        """发送个人消息（放入发送队列即返回）"""
+        info = self.connections.get(connection_id)
+        if info is None:
+            return False
+        # 只有个人消息更新最后活动时间，广播不逐个写时间戳
+        info.last_activity = self.now_iso()
+        return self._enqueue(info, dumps_message(message))
+    
+    def _send_to_many(self, targets: List[ConnInfo], text: str) -> List[str]:
+        """把同一份文本放入多个连接的发送队列，慢连接只会积压自己的队列；返回未能入队的连接"""
+        return [info.id for info in targets if not self._enqueue(info, text)]
+    
+    def _broadcast_raw(self, room_id: str, text: str, exclude: List[str] = None) -> Tuple[int, int]:
+        """把已序列化的消息放入房间内所有连接的发送队列，返回(成功数, 失败数)"""
+        room = self.room_connections.get(room_id)
+        if not room:
+            return 0, 0
+        
+        if exclude:
+            exclude_ids = set(exclude)
+            targets = [info for info in room if info.id not in exclude_ids]
+        else:
+            targets = list(room)
+        failed = len(self._send_to_many(targets, text))
+        return len(targets) - failed, failed
     
     async def broadcast_to_room(self, room_id: str, message: dict, exclude: List[str] = None):
         """向房间广播消息"""
-        exclude = exclude or []
-        
         if room_id not in self.room_connections:
             return
         
-        connection_ids = self.room_connections[room_id].copy()
-        failed_connections = []
-        
-        for connection_id in connection_ids:
-            if connection_id in exclude:
-                continue
-                
-            success = await self.send_personal_message(message, connection_id)
-            if not success:
-                failed_connections.append(connection_id)
+        # 只序列化一次，所有接收者共用同一份文本
+        sent, failed = self._broadcast_raw(room_id, dumps_message(message), exclude)
         
-        # 清理失败的连接
-        for failed_id in failed_connections:
-            self.disconnect(failed_id)
-        
-        logger.info(f"房间广播 {room_id}: 成功{len(connection_ids) - len(failed_connections)}个, 失败{len(failed_connections)}个")
+        logger.info(f"房间广播 {room_id}: 成功{sent}个, 失败{failed}个")
     
     async def broadcast_to_all(self, message: dict):
         """向所有连接广播消息"""
-        connection_ids = list(self.active_connections.keys())
-        failed_connections = []
-        
-        for connection_id in connection_ids:
-            success = await self.send_personal_message(message, connection_id)
-            if not success:
-                failed_connections.append(connection_id)
+        text = dumps_message(message)
+        sent = failed = 0
+        # 按房间分批入队，每个房间之后让出事件循环，避免大量连接时长时间阻塞
+        for room_id in list(self.room_connections):
+            room_sent, room_failed = self._broadcast_raw(room_id, text)
+            sent += room_sent
+            failed += room_failed
+            await asyncio.sleep(0)
         
-        # 清理失败的连接
-        for failed_id in failed_connections:
-            self.disconnect(failed_id)
-        
-        logger.info(f"全局广播: 成功{len(connection_ids) - len(failed_connections)}个, 失败{len(failed_connections)}个")
+        logger.info(f"全局广播: 成功{sent}个, 失败{failed}个")
+    
+    def get_room_id(self, connection_id: str, default: str = "default") -> str:
+        """获取连接所在房间"""
+        info = self.connections.get(connection_id)
+        return info.room_id if info is not None else default
     
     def get_room_connections(self, room_id: str) -> List[str]:
         """获取房间所有连接"""
-        return self.room_connections.get(room_id, [])
+        return [info.id for info in self.room_connections.get(room_id, ())]
     
     def get_connection_count(self, room_id: str = None) -> int:
         """获取连接数量"""
         if room_id:
-            return len(self.room_connections.get(room_id, []))
-        return len(self.active_connections)
+            return len(self.room_connections.get(room_id, ()))
+        return len(self.connections)
     
     def get_all_rooms(self) -> List[str]:
         """获取所有房间"""
@@ -175,18 +248,16 @@ class ConnectionManager:
     
     def get_connection_info(self, connection_id: str) -> Optional[dict]:
         """获取连接信息"""
-        return self.connection_info.get(connection_id)
+        info = self.connections.get(connection_id)
+        return info.to_dict() if info is not None else None
     
     def get_room_info(self, room_id: str) -> dict:
         """获取房间信息"""
-        connections = self.room_connections.get(room_id, [])
+        connections = self.room_connections.get(room_id, ())
         return {
             "room_id": room_id,
             "connection_count": len(connections),
-            "connections": [
-                self.connection_info.get(conn_id, {"id": conn_id})
-                for conn_id in connections
-            ]
+            "connections": [info.to_dict() for info in connections]
         }
 
 
@@ -1,7 +1,5 @@
 from typing import Dict, Any, Optional
-import json
 import logging
-from datetime import datetime
 
 from ..services.mahjong_game_service import MahjongGameService
 from ..models.mahjong import (
@@ -40,11 +38,11 @@ class MessageHandler:
             request_id = message_data.get("request_id", "")
             
             if message_type != "request":
-                await self._send_error_response(websocket, request_id, f"不支持的消息类型: {message_type}")
+                await self._send_error_response(connection_id, request_id, f"不支持的消息类型: {message_type}")
                 return
             
             if action not in self.handlers:
-                await self._send_error_response(websocket, request_id, f"不支持的操作: {action}")
+                await self._send_error_response(connection_id, request_id, f"不支持的操作: {action}")
                 return
             
             # 调用对应的处理函数
@@ -53,13 +51,13 @@ class MessageHandler:
             
         except Exception as e:
             logger.error(f"处理消息失败 {connection_id}: {e}")
-            await self._send_error_response(websocket, 
+            await self._send_error_response(connection_id, 
                                           message_data.get("request_id", ""), 
                                           f"处理消息失败: {str(e)}")
     
-    async def _send_response(self, websocket, request_id: str, action: str, 
+    async def _send_response(self, connection_id: str, request_id: str, action: str, 
                            success: bool, data: Any = None, message: str = ""):
-        """发送响应消息"""
+        """发送响应消息（经连接的发送队列，与广播共用同一个写者）"""
         response = {
             "type": "response",
             "action": action,
@@ -67,17 +65,15 @@ class MessageHandler:
             "data": data,
             "message": message,
             "request_id": request_id,
-            "timestamp": datetime.now().isoformat()
+            "timestamp": manager.now_iso()
         }
         
-        try:
-            await websocket.send_text(json.dumps(response, ensure_ascii=False))
-        except Exception as e:
-            logger.error(f"发送响应失败: {e}")
+        if not await manager.send_personal_message(response, connection_id):
+            logger.error(f"发送响应失败: 连接 {connection_id} 已断开")
     
-    async def _send_error_response(self, websocket, request_id: str, error_message: str):
+    async def _send_error_response(self, connection_id: str, request_id: str, error_message: str):
         """发送错误响应"""
-        await self._send_response(websocket, request_id, "error", False, None, error_message)
+        await self._send_response(connection_id, request_id, "error", False, None, error_message)
     
     async def _broadcast_event(self, room_id: str, event: str, data: Any, exclude_connections: list = None):
         """广播事件"""
@@ -85,7 +81,7 @@ class MessageHandler:
             "type": "broadcast",
             "event": event,
             "data": data,
-            "timestamp": datetime.now().isoformat()
+            "timestamp": manager.now_iso()
         }
         
         await manager.broadcast_to_room(room_id, message, exclude=exclude_connections or [])
@@ -96,34 +92,34 @@ class MessageHandler:
         """获取游戏状态"""
         try:
             game_state = self.game_service.get_game_state()
-            await self._send_response(websocket, request_id, "get_game_state", True, 
+            await self._send_response(connection_id, request_id, "get_game_state", True, 
                                     {"game_state": game_state}, "获取游戏状态成功")
         except Exception as e:
-            await self._send_error_response(websocket, request_id, f"获取游戏状态失败: {str(e)}")
+            await self._send_error_response(connection_id, request_id, f"获取游戏状态失败: {str(e)}")
     
     async def _handle_set_game_state(self, websocket, connection_id: str, data: dict, request_id: str):
         """设置游戏状态"""
         try:
             game_state = data.get("game_state")
             if not game_state:
-                await self._send_error_response(websocket, request_id, "缺少游戏状态数据")
+                await self._send_error_response(connection_id, request_id, "缺少游戏状态数据")
                 return
             
             success = self.game_service.set_game_state_dict(game_state)
             
             if success:
                 # 广播游戏状态更新
-                room_id = manager.connection_rooms.get(connection_id, "default")
+                room_id = manager.get_room_id(connection_id)
                 await self._broadcast_event(room_id, "game_state_updated", 
                                           {"game_state": game_state}, [connection_id])
                 
-                await self._send_response(websocket, request_id, "set_game_state", True, 
+                await self._send_response(connection_id, request_id, "set_game_state", True, 
                                         {"game_state": game_state}, "设置游戏状态成功")
             else:
-                await self._send_error_response(websocket, request_id, "设置游戏状态失败")
+                await self._send_error_response(connection_id, request_id, "设置游戏状态失败")
                 
         except Exception as e:
-            await self._send_error_response(websocket, request_id, f"设置游戏状态失败: {str(e)}")
+            await self._send_error_response(connection_id, request_id, f"设置游戏状态失败: {str(e)}")
     
     async def _handle_player_action(self, websocket, connection_id: str, data: dict, request_id: str):
         """处理玩家操作"""
@@ -133,7 +129,7 @@ class MessageHandler:
             tile_data = data.get("tile", {})
             
             if not all([operation_type, player_id is not None, tile_data]):
-                await self._send_error_response(websocket, request_id, "缺少必要的操作参数")
+                await self._send_error_response(connection_id, request_id, "缺少必要的操作参数")
                 return
             
             # 创建牌对象
@@ -159,7 +155,7 @@ class MessageHandler:
                 updated_state = self.game_service.get_game_state()
                 
                 # 广播操作结果
-                room_id = manager.connection_rooms.get(connection_id, "default")
+                room_id = manager.get_room_id(connection_id)
                 await self._broadcast_event(room_id, "player_action_performed", {
                     "player_id": player_id,
                     "operation_type": operation_type,
@@ -168,13 +164,13 @@ class MessageHandler:
                     "game_state": updated_state
                 }, [connection_id])
                 
-                await self._send_response(websocket, request_id, "player_action", True,
+                await self._send_response(connection_id, request_id, "player_action", True,
                                         {"game_state": updated_state}, message)
             else:
-                await self._send_error_response(websocket, request_id, message)
+                await self._send_error_response(connection_id, request_id, message)
                 
         except Exception as e:
-            await self._send_error_response(websocket, request_id, f"处理玩家操作失败: {str(e)}")
+            await self._send_error_response(connection_id, request_id, f"处理玩家操作失败: {str(e)}")
     
     async def _handle_game_control(self, websocket, connection_id: str, data: dict, request_id: str):
         """游戏控制操作"""
@@ -186,17 +182,17 @@ class MessageHandler:
                 updated_state = self.game_service.get_game_state()
                 
                 # 广播重置事件
-                room_id = manager.connection_rooms.get(connection_id, "default")
+                room_id = manager.get_room_id(connection_id)
                 await self._broadcast_event(room_id, "game_reset", 
                                           {"game_state": updated_state}, [connection_id])
                 
-                await self._send_response(websocket, request_id, "game_control", True,
+                await self._send_response(connection_id, request_id, "game_control", True,
                                         {"game_state": updated_state}, "游戏重置成功")
             
             elif control_type == "set_current_player":
                 player_id = data.get("player_id")
                 if player_id is None:
-                    await self._send_error_response(websocket, request_id, "缺少玩家ID")
+                    await self._send_error_response(connection_id, request_id, "缺少玩家ID")
                     return
                 
                 current_state = self.game_service.get_game_state()
@@ -204,16 +200,16 @@ class MessageHandler:
                 success = self.game_service.set_game_state_dict(current_state)
                 
                 if success:
-                    room_id = manager.connection_rooms.get(connection_id, "default")
+                    room_id = manager.get_room_id(connection_id)
                     await self._broadcast_event(room_id, "current_player_changed", {
                         "current_player": player_id,
                         "game_state": current_state
                     }, [connection_id])
                     
-                    await self._send_response(websocket, request_id, "game_control", True,
+                    await self._send_response(connection_id, request_id, "game_control", True,
                                             {"current_player": player_id}, f"当前玩家已切换为: {player_id}")
                 else:
-                    await self._send_error_response(websocket, request_id, "设置当前玩家失败")
+                    await self._send_error_response(connection_id, request_id, "设置当前玩家失败")
             
             elif control_type == "next_player":
                 current_state = self.game_service.get_game_state()
@@ -224,25 +220,25 @@ class MessageHandler:
                 success = self.game_service.set_game_state_dict(current_state)
                 
                 if success:
-                    room_id = manager.connection_rooms.get(connection_id, "default")
+                    room_id = manager.get_room_id(connection_id)
                     await self._broadcast_event(room_id, "current_player_changed", {
                         "previous_player": current_player,
                         "current_player": next_player,
                         "game_state": current_state
                     }, [connection_id])
                     
-                    await self._send_response(websocket, request_id, "game_control", True, {
+                    await self._send_response(connection_id, request_id, "game_control", True, {
                         "previous_player": current_player,
                         "current_player": next_player
                     }, f"轮到下一个玩家: {next_player}")
                 else:
-                    await self._send_error_response(websocket, request_id, "切换玩家失败")
+                    await self._send_error_response(connection_id, request_id, "切换玩家失败")
             
             else:
-                await self._send_error_response(websocket, request_id, f"不支持的控制操作: {control_type}")
+                await self._send_error_response(connection_id, request_id, f"不支持的控制操作: {control_type}")
                 
         except Exception as e:
-            await self._send_error_response(websocket, request_id, f"游戏控制失败: {str(e)}")
+            await self._send_error_response(connection_id, request_id, f"游戏控制失败: {str(e)}")
     
     async def _handle_missing_suit(self, websocket, connection_id: str, data: dict, request_id: str):
         """定缺操作"""
@@ -254,7 +250,7 @@ class MessageHandler:
                 missing_suit = data.get("missing_suit")
                 
                 if player_id is None or not missing_suit:
-                    await self._send_error_response(websocket, request_id, "缺少玩家ID或定缺花色")
+                    await self._send_error_response(connection_id, request_id, "缺少玩家ID或定缺花色")
                     return
                 
                 # 设置定缺
@@ -272,18 +268,18 @@ class MessageHandler:
                 success = self.game_service.set_game_state_dict(current_state)
                 
                 if success:
-                    room_id = manager.connection_rooms.get(connection_id, "default")
+                    room_id = manager.get_room_id(connection_id)
                     await self._broadcast_event(room_id, "missing_suit_set", {
                         "player_id": player_id,
                         "missing_suit": missing_suit,
                         "game_state": current_state
                     }, [connection_id])
                     
-                    await self._send_response(websocket, request_id, "missing_suit", True,
+                    await self._send_response(connection_id, request_id, "missing_suit", True,
                                             {"player_id": player_id, "missing_suit": missing_suit},
                                             f"玩家{player_id}定缺设置成功: {missing_suit}")
                 else:
-                    await self._send_error_response(websocket, request_id, "设置定缺失败")
+                    await self._send_error_response(connection_id, request_id, "设置定缺失败")
             
             elif action_type == "get":
                 current_state = self.game_service.get_game_state()
@@ -292,7 +288,7 @@ class MessageHandler:
                 for player_id, hand in current_state.get("player_hands", {}).items():
                     missing_suits[player_id] = hand.get("missing_suit")
                 
-                await self._send_response(websocket, request_id, "missing_suit", True,
+                await self._send_response(connection_id, request_id, "missing_suit", True,
                                         {"missing_suits": missing_suits}, "获取定缺信息成功")
             
             elif action_type == "reset":
@@ -304,20 +300,20 @@ class MessageHandler:
                 success = self.game_service.set_game_state_dict(current_state)
                 
                 if success:
-                    room_id = manager.connection_rooms.get(connection_id, "default")
+                    room_id = manager.get_room_id(connection_id)
                     await self._broadcast_event(room_id, "missing_suits_reset", 
                                               {"game_state": current_state}, [connection_id])
                     
-                    await self._send_response(websocket, request_id, "missing_suit", True,
+                    await self._send_response(connection_id, request_id, "missing_suit", True,
                                             {"game_state": current_state}, "所有玩家定缺已重置")
                 else:
-                    await self._send_error_response(websocket, request_id, "重置定缺失败")
+                    await self._send_error_response(connection_id, request_id, "重置定缺失败")
             
             else:
-                await self._send_error_response(websocket, request_id, f"不支持的定缺操作: {action_type}")
+                await self._send_error_response(connection_id, request_id, f"不支持的定缺操作: {action_type}")
                 
         except Exception as e:
-            await self._send_error_response(websocket, request_id, f"定缺操作失败: {str(e)}")
+            await self._send_error_response(connection_id, request_id, f"定缺操作失败: {str(e)}")
     
     async def _handle_export_record(self, websocket, connection_id: str, data: dict, request_id: str):
         """导出牌谱"""
@@ -328,10 +324,10 @@ class MessageHandler:
             game_record = {
                 "game_info": {
                     "game_id": current_state.get("game_id", "unknown"),
-                    "start_time": datetime.now().isoformat(),
+                    "start_time": manager.now_iso(),
                     "player_count": 4,
                     "game_mode": "xuezhan_daodi",
-                    "export_time": datetime.now().isoformat()
+                    "export_time": manager.now_iso()
                 },
                 "players": {
                     "0": {"name": "我", "position": "我"},
@@ -354,18 +350,18 @@ class MessageHandler:
                 if player_missing:
                     game_record["missing_suits"][player_id] = player_missing
             
-            await self._send_response(websocket, request_id, "export_record", True,
+            await self._send_response(connection_id, request_id, "export_record", True,
                                     {"game_record": game_record}, "牌谱导出成功")
             
         except Exception as e:
-            await self._send_error_response(websocket, request_id, f"导出牌谱失败: {str(e)}")
+            await self._send_error_response(connection_id, request_id, f"导出牌谱失败: {str(e)}")
     
     async def _handle_import_record(self, websocket, connection_id: str, data: dict, request_id: str):
         """导入牌谱"""
         try:
             game_record = data.get("game_record")
             if not game_record:
-                await self._send_error_response(websocket, request_id, "请提供有效的牌谱数据")
+                await self._send_error_response(connection_id, request_id, "请提供有效的牌谱数据")
                 return
             
             # 重置游戏状态
@@ -402,26 +398,26 @@ class MessageHandler:
             updated_state = self.game_service.get_game_state()
             
             # 广播牌谱导入事件
-            room_id = manager.connection_rooms.get(connection_id, "default")
+            room_id = manager.get_room_id(connection_id)
             await self._broadcast_event(room_id, "game_record_imported", 
                                       {"game_state": updated_state}, [connection_id])
             
-            await self._send_response(websocket, request_id, "import_record", True,
+            await self._send_response(connection_id, request_id, "import_record", True,
                                     {"game_state": updated_state}, 
                                     f"牌谱导入成功，共导入{len(actions)}个操作")
             
         except Exception as e:
-            await self._send_error_response(websocket, request_id, f"导入牌谱失败: {str(e)}")
+            await self._send_error_response(connection_id, request_id, f"导入牌谱失败: {str(e)}")
     
     async def _handle_health_check(self, websocket, connection_id: str, data: dict, request_id: str):
         """健康检查"""
-        await self._send_response(websocket, request_id, "health_check", True,
+        await self._send_response(connection_id, request_id, "health_check", True,
                                 {"status": "healthy"}, "WebSocket服务正常运行")
     
     async def _handle_get_connections(self, websocket, connection_id: str, data: dict, request_id: str):
         """获取连接信息"""
         try:
-            room_id = manager.connection_rooms.get(connection_id, "default")
+            room_id = manager.get_room_id(connection_id)
             room_info = manager.get_room_info(room_id)
             all_rooms = manager.get_all_rooms()
             
@@ -432,11 +428,11 @@ class MessageHandler:
                 "total_connections": manager.get_connection_count()
             }
             
-            await self._send_response(websocket, request_id, "get_connections", True,
+            await self._send_response(connection_id, request_id, "get_connections", True,
                                     connection_info, "获取连接信息成功")
             
         except Exception as e:
-            await self._send_error_response(websocket, request_id, f"获取连接信息失败: {str(e)}")
+            await self._send_error_response(connection_id, request_id, f"获取连接信息失败: {str(e)}")
 
 
 # 全局消息处理器实例
@@ -24,10 +24,7 @@ async def websocket_endpoint(
     connection_id = client_id or f"conn_{uuid.uuid4().hex[:8]}"
     
     try:
-        # 建立连接
-        await manager.connect(websocket, connection_id, room_id)
-        
-        # 发送连接成功消息
+        # 连接成功消息，建立连接时先于房间广播放入发送队列
         welcome_message = {
             "type": "system",
             "event": "connected",
@@ -38,7 +35,9 @@ async def websocket_endpoint(
             },
             "timestamp": "2024-01-01T00:00:00"
         }
-        await websocket.send_text(json.dumps(welcome_message, ensure_ascii=False))
+        
+        # 建立连接
+        await manager.connect(websocket, connection_id, room_id, welcome_message)
         
         # 监听消息
         while True:
@@ -52,13 +51,16 @@ async def websocket_endpoint(
                 # 处理消息
                 await handler.handle_message(websocket, connection_id, message_data)
                 
+            except WebSocketDisconnect:
+                raise
+            
             except json.JSONDecodeError:
                 error_message = {
                     "type": "error",
                     "message": "消息格式错误，请发送有效的JSON数据",
                     "timestamp": "2024-01-01T00:00:00"
                 }
-                await websocket.send_text(json.dumps(error_message, ensure_ascii=False))
+                await manager.send_personal_message(error_message, connection_id)
             
             except Exception as e:
                 logger.error(f"处理消息异常 {connection_id}: {e}")
@@ -67,7 +69,9 @@ async def websocket_endpoint(
                     "message": f"处理消息失败: {str(e)}",
                     "timestamp": "2024-01-01T00:00:00"
                 }
-                await websocket.send_text(json.dumps(error_message, ensure_ascii=False))
+                # 错误响应经发送队列发出，不会因连接已断开而抛出；连接已被清理时结束接收
+                if not await manager.send_personal_message(error_message, connection_id):
+                    break
     
     except WebSocketDisconnect:
         # WebSocket断开连接
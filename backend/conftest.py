@@ -0,0 +1,25 @@
+"""
+测试共用的工具
+"""
+
+import pytest
+import redis
+
+
+class FailingPipeline:
+    """execute()总是失败的管道，模拟Redis写入中断"""
+
+    def __init__(self, pipe):
+        self._pipe = pipe
+
+    def __getattr__(self, name):
+        return getattr(self._pipe, name)
+
+    def execute(self):
+        raise redis.ConnectionError("模拟写入失败")
+
+
+@pytest.fixture
+def failing_pipeline():
+    """包装真实管道、使其写入失败的FailingPipeline类"""
+    return FailingPipeline
@@ -51,7 +51,9 @@ def main():
         host=settings.REDIS_HOST,
         port=settings.API_PORT,
         reload=settings.DEBUG,
-        log_level=settings.LOG_LEVEL.lower()
+        log_level=settings.LOG_LEVEL.lower(),
+        # 安装了uvloop时使用uvloop事件循环（Windows上没有uvloop，退回asyncio）
+        loop="auto"
     )
 
 if __name__ == "__main__":
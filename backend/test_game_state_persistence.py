@@ -0,0 +1,125 @@
+#!/usr/bin/env python3
+"""
+游戏状态测试
+GameState按玩家下标存放各玩家字段，对外以玩家ID字符串为键的字典收发；
+服务端状态按字段存为Redis哈希，操作历史存为只追加的Redis列表
+"""
+
+import fakeredis
+import pytest
+from pydantic import ValidationError
+
+from app.models.mahjong import GameState, HandTiles, Tile, TileType
+from app.services import mahjong_game_service
+from app.services.mahjong_game_service import MahjongGameService
+
+
+@pytest.fixture
+def redis_client(monkeypatch):
+    """每个测试使用独立的fakeredis，服务实例通过_get_redis取得"""
+    client = fakeredis.FakeRedis(server=fakeredis.FakeServer())
+    monkeypatch.setattr(mahjong_game_service, "_get_redis", lambda: client)
+    return client
+
+
+def _wait_for_writes():
+    """等待后台线程执行完已提交的写入"""
+    mahjong_game_service._STATE_WRITER.submit(lambda: None).result()
+
+
+def _assert_reloads_same_state(service: MahjongGameService):
+    """新的服务实例从Redis加载出的状态与内存中一致"""
+    _wait_for_writes()
+    reloaded = MahjongGameService().get_game_state()
+    state = service.get_game_state()
+    assert reloaded["player_hands"] == state["player_hands"]
+    assert reloaded["actions_history"] == state["actions_history"]
+
+
+def test_game_state_accepts_player_dicts():
+    """以玩家ID为键的字典转换为4个位置的列表，缺失的玩家补默认值"""
+    state = GameState.model_validate({
+        "game_id": "state_dict",
+        "player_hands": {"2": {"tile_count": 5}},
+        "player_discarded_tiles": {"1": [{"type": "wan", "value": 3}]},
+    })
+
+    assert len(state.player_hands) == 4
+    assert state.player_hands[2].tile_count == 5
+    assert state.player_hands[0] == HandTiles()
+    assert state.player_discarded_tiles == [[], [Tile(type=TileType.WAN, value=3)], [], []]
+
+
+def test_game_state_serializes_players_as_dicts():
+    """序列化时还原为以玩家ID字符串为键的字典，再次解析结果不变"""
+    state = GameState.model_validate({
+        "game_id": "state_round_trip",
+        "player_hands": {"0": {"tiles": [{"type": "tong", "value": 7}], "tile_count": 1}},
+    })
+
+    dumped = state.model_dump(mode="json")
+    assert list(dumped["player_hands"]) == ["0", "1", "2", "3"]
+    assert list(dumped["player_discarded_tiles"]) == ["0", "1", "2", "3"]
+    assert dumped["player_hands"]["0"]["tiles"] == [{"type": "tong", "value": 7, "id": None}]
+    assert GameState.model_validate(dumped).model_dump(mode="json") == dumped
+
+
+def test_game_state_rejects_unknown_player_id():
+    """玩家ID超出0-3时校验失败"""
+    with pytest.raises(ValidationError):
+        GameState.model_validate({"game_id": "state_invalid", "player_hands": {"4": {}}})
+
+
+def test_actions_history_appends_to_list(redis_client):
+    """每次保存只把新增的操作追加到历史列表"""
+    service = MahjongGameService()
+    service.set_player_missing_suit(0, "wan")
+    service.set_player_missing_suit(1, "tiao")
+    _wait_for_writes()
+
+    assert redis_client.type(service.game_state_key) == b"hash"
+    assert not redis_client.hexists(service.game_state_key, "actions_history")
+    assert redis_client.llen(service.history_key) == 2
+
+    service.add_tile_to_hand(0, Tile(type=TileType.WAN, value=1))
+    _wait_for_writes()
+
+    assert redis_client.llen(service.history_key) == 3
+    _assert_reloads_same_state(service)
+
+
+def test_replaced_actions_history_rewrites_list(redis_client):
+    """历史被整体替换时重写列表，而不是在旧列表后追加"""
+    service = MahjongGameService()
+    service.set_player_missing_suit(0, "wan")
+    service.set_player_missing_suit(1, "tiao")
+
+    state = dict(service.get_game_state())
+    state["actions_history"] = state["actions_history"][-1:]
+    service.set_game_state_dict(state)
+    _wait_for_writes()
+
+    assert redis_client.llen(service.history_key) == 1
+    _assert_reloads_same_state(service)
+
+
+def test_state_writer_recovers_after_failed_write(redis_client, monkeypatch, failing_pipeline):
+    """后台写入失败后，下次保存整体重写状态哈希和历史列表"""
+    service = MahjongGameService()
+    service.set_player_missing_suit(0, "wan")
+    _wait_for_writes()
+
+    with monkeypatch.context() as patch:
+        real_pipeline = redis_client.pipeline
+        patch.setattr(redis_client, "pipeline", lambda **kwargs: failing_pipeline(real_pipeline(**kwargs)))
+        service.set_player_missing_suit(1, "tiao")
+        _wait_for_writes()
+
+    # 丢失的写入没有进入Redis
+    assert redis_client.llen(service.history_key) == 1
+
+    service.set_player_missing_suit(2, "tong")
+    _wait_for_writes()
+
+    assert redis_client.llen(service.history_key) == 3
+    _assert_reloads_same_state(service)
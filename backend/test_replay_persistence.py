@@ -0,0 +1,171 @@
+#!/usr/bin/env python3
+"""
+牌谱持久化测试
+进行中的游戏拆分为记录本体和操作列表写入Redis，读取时拼回完整牌谱
+"""
+
+from datetime import datetime
+
+import fakeredis
+import pytest
+
+from app.models.game_record import GameRecord, GameAction, PlayerGameRecord, ActionType, MahjongCard
+from app.services import replay_service
+from app.services.redis_service import RedisService
+from app.services.replay_service import ReplayService, queue_game_record, game_actions_key
+
+
+class FakeRedisService(RedisService):
+    """数据存放在fakeredis中的RedisService"""
+
+    def _initialize_connection(self):
+        self.redis_client = fakeredis.FakeRedis(server=fakeredis.FakeServer())
+
+
+@pytest.fixture
+def redis_service():
+    return FakeRedisService()
+
+
+def _make_record(game_id: str, action_count: int) -> GameRecord:
+    """构造一局有action_count条操作的进行中游戏"""
+    record = GameRecord(
+        game_id=game_id,
+        start_time=datetime(2024, 1, 1, 12, 0, 0),
+        players=[
+            PlayerGameRecord(player_id=i, player_name=f"玩家{i+1}", position=i)
+            for i in range(4)
+        ],
+        snapshots={1: {"current_player": 0}},
+    )
+    _append_actions(record, action_count)
+    return record
+
+
+def _append_actions(record: GameRecord, count: int):
+    for _ in range(count):
+        sequence = len(record.actions) + 1
+        record.actions.append(GameAction(
+            sequence=sequence,
+            timestamp=datetime(2024, 1, 1, 12, 0, sequence % 60),
+            player_id=sequence % 4,
+            action_type=ActionType.DISCARD,
+            card=MahjongCard(id=sequence, suit="wan", value=sequence % 9 + 1),
+        ))
+    record.total_actions = len(record.actions)
+
+
+def _save(redis_service: RedisService, record: GameRecord):
+    pipe = redis_service.pipeline()
+    queue_game_record(pipe, record)
+    pipe.execute()
+
+
+def test_in_progress_record_round_trip(redis_service):
+    """进行中的游戏：记录本体不含操作，读取时与操作列表合并为完整牌谱"""
+    record = _make_record("persist_round_trip", 3)
+    _save(redis_service, record)
+
+    client = redis_service.redis_client
+    assert b'"actions"' not in client.get("game_record:persist_round_trip")
+    assert client.llen(game_actions_key("persist_round_trip")) == 3
+
+    service = ReplayService(redis_service)
+    data, missing = service._get_record_json_many(["persist_round_trip", "persist_missing"])
+    assert missing is None
+    assert GameRecord.model_validate_json(data) == record
+
+
+def test_in_progress_record_appends_only_new_actions(redis_service):
+    """再次保存时只追加新增操作，合并结果与内存中的记录一致"""
+    record = _make_record("persist_append", 2)
+    _save(redis_service, record)
+    _append_actions(record, 3)
+    _save(redis_service, record)
+
+    assert redis_service.redis_client.llen(game_actions_key("persist_append")) == 5
+    data = ReplayService(redis_service)._get_record_json("persist_append")
+    assert GameRecord.model_validate_json(data) == record
+
+
+def test_ended_record_replaces_action_list(redis_service):
+    """游戏结束后写入完整牌谱并删除操作列表"""
+    record = _make_record("persist_ended", 4)
+    _save(redis_service, record)
+    record.end_time = datetime(2024, 1, 1, 12, 30, 0)
+    _save(redis_service, record)
+
+    client = redis_service.redis_client
+    assert not client.exists(game_actions_key("persist_ended"))
+    assert "persist_ended" not in replay_service._persisted_actions
+    data = ReplayService(redis_service)._get_record_json("persist_ended")
+    assert GameRecord.model_validate_json(data) == record
+
+
+@pytest.mark.asyncio
+async def test_record_writer_recovers_after_failed_write(redis_service, monkeypatch, failing_pipeline):
+    """后台写入失败后丢弃操作计数，下次保存整体重写操作列表"""
+    game_id = "writer_recover"
+    service = ReplayService(redis_service)
+    await service.start_game_recording(game_id, [{"name": f"玩家{i+1}"} for i in range(4)])
+    await service.record_action(game_id, 0, ActionType.DRAW)
+    await replay_service.flush_pending_saves(redis_service)
+    assert replay_service._persisted_actions[game_id] == 1
+
+    with monkeypatch.context() as patch:
+        real_pipeline = redis_service.pipeline
+        patch.setattr(redis_service, "pipeline", lambda: failing_pipeline(real_pipeline()))
+        await service.record_action(game_id, 1, ActionType.DISCARD)
+        await replay_service.flush_pending_saves(redis_service)
+
+    # 失败在事件循环线程上处理，flush返回时计数已被丢弃
+    assert game_id not in replay_service._persisted_actions
+    assert redis_service.redis_client.llen(game_actions_key(game_id)) == 1
+
+    await service.record_action(game_id, 2, ActionType.DRAW)
+    await replay_service.flush_pending_saves(redis_service)
+
+    assert redis_service.redis_client.llen(game_actions_key(game_id)) == 3
+    record = await service._load_game_record(game_id)
+    assert [action.sequence for action in record.actions] == [1, 2, 3]
+
+
+def test_list_backfills_unindexed_records(redis_service, monkeypatch):
+    """没有摘要和索引的旧牌谱（不过期的导入记录）在列表不满一页时补建索引"""
+    from fastapi.testclient import TestClient
+    from app.api.v1.replay import get_replay_service
+    from app.main import app
+
+    monkeypatch.setattr(replay_service, "_game_index_backfilled", False)
+    record = _make_record("legacy_unindexed", 2)
+    record.end_time = datetime(2024, 1, 1, 12, 30, 0)
+    redis_service.redis_client.set("game_record:legacy_unindexed", record.model_dump_json())
+
+    app.dependency_overrides[get_replay_service] = lambda: ReplayService(redis_service)
+    try:
+        response = TestClient(app).get("/api/v1/replay/list")
+    finally:
+        app.dependency_overrides.pop(get_replay_service, None)
+
+    assert response.status_code == 200
+    assert [game["game_id"] for game in response.json()["data"]] == ["legacy_unindexed"]
+    # 记录本身不过期，补建的摘要也不过期
+    assert redis_service.redis_client.ttl("game_summary:legacy_unindexed") == -1
+
+
+@pytest.mark.asyncio
+async def test_player_history_backfills_missing_index(redis_service, monkeypatch):
+    """玩家历史同样补建索引：没有摘要的旧牌谱，以及玩家索引已过期的不过期牌谱"""
+    monkeypatch.setattr(replay_service, "_game_index_backfilled", False)
+    unindexed = _make_record("legacy_player_unindexed", 1)
+    redis_service.redis_client.set("game_record:legacy_player_unindexed", unindexed.model_dump_json())
+    expired_index = _make_record("legacy_player_expired", 1)
+    expired_index.start_time = datetime(2024, 1, 2, 12, 0, 0)
+    pipe = redis_service.pipeline()
+    queue_game_record(pipe, expired_index, expire=None)
+    pipe.execute()
+    redis_service.redis_client.delete(replay_service.player_games_key("玩家1"))
+
+    history = await ReplayService(redis_service).get_player_game_history("玩家1")
+
+    assert [record.game_id for record in history] == ["legacy_player_expired", "legacy_player_unindexed"]